@@ -0,0 +1,121 @@
+import logging
+import re
+
+# Keyword rules per option of the Level, Field of Work and Industry
+# properties defined in NotionManager.update_database_properties. Level rules
+# are listed by precedence: the first level that matches wins.
+LEVEL_RULES = [
+    ('Founder', r'co-?founder|founder|founding partner'),
+    ('C-Level', r'ceo|cto|cfo|coo|cmo|cio|cpo|chief|(?<!vice[- ])president|managing director|managing partner'),
+    # 'partner' only as a firm partner, not an HR business partner or partner manager
+    ('Director', r'vp|svp|evp|vice[- ]president|director|head of|(?<!business )partner(?! manager)'),
+    ('Self-Employed', r'freelance\w*|self[- ]employed|independent|sole proprietor'),
+    ('Lead', r'lead|manager|principal|staff|supervisor'),
+    ('IC', r'engineer|developer|analyst|designer|specialist|associate|consultant|scientist|researcher|'
+           r'intern|assistant|representative|officer|accountant|architect|advisor'),
+]
+
+FIELD_OF_WORK_RULES = [
+    ('Software Development', r'software|engineer\w*|developer|programmer|devops|sre|architect|'
+                             r'frontend|front-end|backend|back-end|full[- ]?stack|machine learning|data scientist'),
+    ('Marketing', r'marketing|brand|growth|seo|content|communications|social media|pr'),
+    ('Sales', r'sales|account executive|account manager|business development|bdr|sdr|partnerships'),
+    ('Operations', r'operations|ops|supply chain|logistics|procurement|coo'),
+]
+
+INDUSTRY_RULES = [
+    ('Technology', r'tech\w*|software|labs|digital|cloud|data|ai|systems|google|microsoft|amazon|aws|meta|apple|sap|ibm'),
+    ('Insurance', r'insurance|assurance|versicherung|reinsurance|allianz|axa|munich re|zurich'),
+    ('Banking', r'bank\w*|banco|capital|credit|financial|finance|ing|hsbc|barclays|jpmorgan|goldman sachs|morgan stanley'),
+    ('Healthcare', r'health\w*|hospital|clinic\w*|medical|pharma\w*|bio\w*|care homes?'),
+    ('Manufacturing', r'manufactur\w*|industries|industrial|siemens|bosch'),
+    ('Education', r'universit\w*|universität|school|college|academy|education|institute'),
+    ('Retail', r'retail|stores?|shop\w*|e-?commerce|zalando|ikea'),
+    ('Automotive', r'automotive|motors?|auto|bmw|volkswagen|mercedes-benz|tesla|daimler|porsche'),
+    ('Construction', r'construction|builders|bau'),
+    ('Real Estate', r'real estate|propert(?:y|ies)|realty|immobilien'),
+    ('Hospitality', r'hotels?|hospitality|restaurants?|resorts?|travel|booking'),
+    ('Energy', r'energy|power|solar|wind|oil|gas|utilities|shell|bp'),
+]
+
+SELF_EMPLOYED_COMPANY = re.compile(r'\b(?:freelance\w*|self[- ]employed|independent)\b', re.IGNORECASE)
+
+
+def _compile_rules(rules):
+    """Compile a rule list into a single alternation with one named group per label.
+
+    Matching a string is then one left-to-right scan regardless of the number
+    of labels, and the matched group name maps back to its label.
+    """
+    group_labels = {}
+    alternatives = []
+    for index, (label, pattern) in enumerate(rules):
+        group_name = f'rule{index}'
+        group_labels[group_name] = label
+        alternatives.append(f'(?P<{group_name}>{pattern})')
+    regex = re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b', re.IGNORECASE)
+    return regex, group_labels
+
+
+class ContactClassifier:
+    """Rule-based Industry, Level and Field of Work classification.
+
+    Results are memoized per distinct position and company, so a batch only
+    pays for each unique value once.
+    """
+
+    def __init__(self):
+        self._level_regex, self._level_labels = _compile_rules(LEVEL_RULES)
+        self._level_precedence = {label: index for index, (label, _) in enumerate(LEVEL_RULES)}
+        self._field_regex, self._field_labels = _compile_rules(FIELD_OF_WORK_RULES)
+        self._industry_regex, self._industry_labels = _compile_rules(INDUSTRY_RULES)
+        self._position_cache = {}
+        self._company_cache = {}
+
+    def classify(self, position, company):
+        """Return the Industry, Level and Field of Work for a position and company."""
+        level, fields_of_work = self._classify_position(position or '')
+        industries, self_employed = self._classify_company(company or '')
+        if self_employed and level in (None, 'IC'):
+            level = 'Self-Employed'
+        return {
+            'Industry': list(industries),
+            'Level': level,
+            'Field of Work': list(fields_of_work),
+        }
+
+    def classify_contacts(self, contacts):
+        """Add the classified fields to each contact in place."""
+        for contact in contacts:
+            contact.update(self.classify(contact.get('Position'), contact.get('Company')))
+        logging.info(
+            f"Classified {len(contacts)} contacts using {len(self._position_cache)} unique positions "
+            f"and {len(self._company_cache)} unique companies"
+        )
+        return contacts
+
+    def _classify_position(self, position):
+        key = position.strip().lower()
+        if key not in self._position_cache:
+            level_labels = self._matches(self._level_regex, self._level_labels, key)
+            level = min(level_labels, key=self._level_precedence.get) if level_labels else None
+            fields_of_work = tuple(self._matches(self._field_regex, self._field_labels, key))
+            self._position_cache[key] = (level, fields_of_work)
+        return self._position_cache[key]
+
+    def _classify_company(self, company):
+        key = company.strip().lower()
+        if key not in self._company_cache:
+            industries = tuple(self._matches(self._industry_regex, self._industry_labels, key))
+            self_employed = bool(SELF_EMPLOYED_COMPANY.search(key))
+            self._company_cache[key] = (industries, self_employed)
+        return self._company_cache[key]
+
+    def _matches(self, regex, group_labels, text):
+        """Return the distinct labels matched in text, in order of first match."""
+        labels = []
+        for match in regex.finditer(text):
+            label = group_labels[match.lastgroup]
+            if label not in labels:
+                labels.append(label)
+        return labels
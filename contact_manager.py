@@ -1,9 +1,20 @@
 import logging
+from contact_classifier import ContactClassifier
+
+# Fields filled in by ContactClassifier rather than the LinkedIn export
+CLASSIFIED_FIELDS = ['Industry', 'Level', 'Field of Work']
+# Fields only a user fills in; pages with any of them are never archived
+PROTECTED_FIELDS = ['Last Contacted', 'Connection', 'Contact Schedule']
 
 class ContactManager:
-    def __init__(self, notion_manager, linkedin_parser):
+    def __init__(self, notion_manager, linkedin_parser, classifier=None):
         self.notion_manager = notion_manager
         self.linkedin_parser = linkedin_parser
+        self.classifier = classifier or ContactClassifier()
+
+    def classify_contacts(self, contacts):
+        """Fill in Industry, Level and Field of Work for each contact."""
+        return self.classifier.classify_contacts(contacts)
 
     def _is_valid_contact(self, contact):
         """Check if the contact has any meaningful data."""
@@ -19,23 +30,34 @@ class ContactManager:
         
         return has_valid_data
 
-    def _process_single_contact(self, contact, existing_contacts):
+    def index_by_linkedin_url(self, existing_contacts):
+        """Map LinkedIn URL to Notion page, skipping pages without a URL."""
+        index = {}
+        for existing in existing_contacts:
+            url = (existing['properties'].get('LinkedIn URL') or {}).get('url')
+            if url:
+                index.setdefault(url, existing)
+        return index
+
+    def _process_single_contact(self, contact, existing_by_url):
         """Process a single contact, either updating existing or adding new."""
         try:
             linkedin_url = contact.get('LinkedIn URL')
-            existing_contact = None
-            
-            # Find existing contact by LinkedIn URL
-            for existing in existing_contacts:
-                if existing['properties'].get('LinkedIn URL', {}).get('url') == linkedin_url:
-                    existing_contact = existing
-                    break
+            existing_contact = existing_by_url.get(linkedin_url) if linkedin_url else None
 
             if existing_contact:
                 # Compare and update only if changed
                 if self._has_changes(existing_contact, contact):
-                    self.notion_manager.update_contact(existing_contact['id'], contact)
+                    updates = self._without_filled_classifications(existing_contact, contact)
+                    if self._is_tagged_removed(existing_contact):
+                        # The connection is back in the export
+                        updates['Removed from LinkedIn'] = False
+                    self.notion_manager.update_contact(existing_contact['id'], updates)
                     logging.info(f"Updated contact: {contact.get('Name')}")
+                elif self._missing_classifications(existing_contact, contact):
+                    self.notion_manager.add_classifications(
+                        existing_contact['id'], self._missing_classifications(existing_contact, contact))
+                    logging.info(f"Added classifications to contact: {contact.get('Name')}")
                 else:
                     logging.info(f"No changes detected for contact: {contact.get('Name')}")
             else:
@@ -49,6 +71,10 @@ class ContactManager:
     def _has_changes(self, existing_contact, new_contact):
         try:
             properties = existing_contact['properties']
+
+            if self._is_tagged_removed(existing_contact):
+                logging.info("Contact tagged as removed from LinkedIn is in the export again")
+                return True
             
             def normalize(s):
                 if not s:
@@ -86,6 +112,102 @@ class ContactManager:
             logging.warning(f"Error comparing contacts, assuming changes needed: {str(e)}")
             return True
 
+    def find_removed_contacts(self, existing_by_url, linkedin_contacts):
+        """Split pages whose LinkedIn URL is not in the export into (removable, protected).
+
+        Protected pages carry user-entered data in one of PROTECTED_FIELDS.
+        """
+        export_urls = {contact.get('LinkedIn URL') for contact in linkedin_contacts}
+        removable = []
+        protected = []
+        for url, existing in existing_by_url.items():
+            if url in export_urls:
+                continue
+            properties = existing['properties']
+            if existing.get('archived'):
+                continue
+            if any(self._has_user_value(properties.get(field)) for field in PROTECTED_FIELDS):
+                protected.append(existing)
+            else:
+                removable.append(existing)
+        logging.info(f"Found {len(removable)} removable and {len(protected)} protected contacts missing from export")
+        return removable, protected
+
+    def reconcile_removed_contacts(self, removable, protected, mode, progress_callback=None, slice_size=100):
+        """Tag or archive contacts missing from the export.
+
+        In 'tag' mode every missing page is tagged. In 'archive' mode removable
+        pages are archived and protected pages are tagged instead.
+
+        This is a generator: it yields the number of writes left after every
+        slice_size writes, so a scheduled job can let other jobs run in
+        between, and returns (archived, tagged).
+        """
+        to_archive = []
+        if mode == 'archive':
+            to_archive = [page['id'] for page in removable]
+            to_tag = [page['id'] for page in protected if not self._is_tagged_removed(page)]
+        else:
+            to_tag = [page['id'] for page in removable + protected if not self._is_tagged_removed(page)]
+
+        slices = [('archive', self.notion_manager.archive_contacts, to_archive[start:start + slice_size])
+                  for start in range(0, len(to_archive), slice_size)]
+        slices += [('tag', self.notion_manager.tag_removed_contacts, to_tag[start:start + slice_size])
+                   for start in range(0, len(to_tag), slice_size)]
+        total = len(to_archive) + len(to_tag)
+        done = 0
+        counts = {'archive': 0, 'tag': 0}
+        for action, write, page_ids in slices:
+            if done:
+                yield total - done
+
+            def report_progress(current, _):
+                # Progress across both actions rather than within this slice
+                progress_callback(done + current, total)
+
+            counts[action] += write(page_ids, report_progress if progress_callback else None)
+            done += len(page_ids)
+        logging.info(f"Reconciliation ({mode}): {counts['archive']} archived, {counts['tag']} tagged")
+        return counts['archive'], counts['tag']
+
+    def _is_tagged_removed(self, page):
+        return bool((page['properties'].get('Removed from LinkedIn') or {}).get('checkbox'))
+
+    def _has_user_value(self, prop):
+        if not prop:
+            return False
+        return bool(self._get_date_value(prop) or self._get_select_values(prop))
+
+    def _without_filled_classifications(self, existing_contact, contact):
+        """Drop classified fields the page already has, or has had, a value for, keeping manual edits."""
+        updates = {key: value for key, value in contact.items() if key not in CLASSIFIED_FIELDS}
+        updates.update(self._missing_classifications(existing_contact, contact))
+        return updates
+
+    def _missing_classifications(self, existing_contact, contact):
+        """Classified values for the page's empty fields, unless the page was classified before.
+
+        A page is classified at most once, so a value a user deliberately
+        cleared is not filled in again by the next sync.
+        """
+        properties = existing_contact['properties']
+        if (properties.get('Classified') or {}).get('checkbox'):
+            return {}
+        return {
+            field: contact.get(field) for field in CLASSIFIED_FIELDS
+            if contact.get(field) and not self._get_select_values(properties.get(field))
+        }
+
+    def _get_select_values(self, prop):
+        """Extract option names from a select or multi_select property"""
+        if not prop:
+            return []
+        if prop.get('multi_select'):
+            return [option['name'] for option in prop['multi_select']]
+        if prop.get('select'):
+            return [prop['select']['name']]
+        return []
+
     def _get_title_value(self, prop):
         """Extract value from a title property"""
         if not prop or 'title' not in prop:
@@ -113,3 +235,19 @@ class ContactManager:
         except Exception as e:
             logging.error(f"Error retrieving contacts: {str(e)}")
             raise
+
+    def prefers_full_scan(self, linkedin_contacts, max_targeted_requests):
+        """Whether get_all_contacts is cheaper than get_existing_contacts for these contacts."""
+        linkedin_urls = [contact.get('LinkedIn URL') for contact in linkedin_contacts]
+        return self.notion_manager.prefers_full_scan(linkedin_urls, max_targeted_requests)
+
+    def get_existing_contacts(self, linkedin_contacts):
+        """Retrieve the Notion contacts whose LinkedIn URL matches one of the given LinkedIn contacts."""
+        try:
+            linkedin_urls = [contact.get('LinkedIn URL') for contact in linkedin_contacts]
+            contacts = self.notion_manager.get_contacts_by_urls(linkedin_urls)
+            logging.info(f"Retrieved {len(contacts)} existing contacts from Notion database.")
+            return contacts
+        except Exception as e:
+            logging.error(f"Error retrieving contacts: {str(e)}")
+            raise
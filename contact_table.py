@@ -0,0 +1,135 @@
+import sys
+from collections.abc import MutableMapping
+
+# Contact fields whose values repeat across many rows of an export
+INTERNED_FIELDS = frozenset(['Company', 'Position', 'Connected On', 'Industry', 'Level', 'Field of Work'])
+
+
+class ContactTable:
+    """Contacts stored column by column instead of as one dict per contact.
+
+    Each field is a list holding one value per row, with None for a field
+    the row does not have. Values of INTERNED_FIELDS are interned so rows
+    sharing a company, position or date share one string object, and
+    multi-value fields are stored as shared tuples.
+
+    Indexing or iterating yields ContactRow views, which behave like the
+    contact dicts used elsewhere without copying the row.
+    """
+
+    def __init__(self, fields=(), interned_fields=INTERNED_FIELDS):
+        self.interned_fields = interned_fields
+        self._columns = {field: [] for field in fields}
+        self._shared_values = {}
+        self._length = 0
+
+    @classmethod
+    def from_columns(cls, columns, interned_fields=INTERNED_FIELDS):
+        """Build a table from a mapping of field name to equally long value lists."""
+        table = cls(interned_fields=interned_fields)
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        table._length = lengths.pop() if lengths else 0
+        for field, values in columns.items():
+            table._columns[field] = [table._store_value(field, value) for value in values]
+        return table
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('contact index out of range')
+        return ContactRow(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield ContactRow(self, index)
+
+    @property
+    def fields(self):
+        return list(self._columns)
+
+    def column(self, field):
+        """Return the values of field for every row, None where a row has none."""
+        return self._columns.get(field) or [None] * self._length
+
+    def append(self, contact):
+        """Add a row from a mapping of field name to value."""
+        for column in self._columns.values():
+            column.append(None)
+        self._length += 1
+        for field, value in contact.items():
+            self.set_value(self._length - 1, field, value)
+
+    def get_value(self, index, field):
+        column = self._columns.get(field)
+        return column[index] if column is not None else None
+
+    def set_value(self, index, field, value):
+        column = self._columns.get(field)
+        if column is None:
+            if value is None:
+                return
+            column = self._columns[field] = [None] * self._length
+        column[index] = self._store_value(field, value)
+
+    def _store_value(self, field, value):
+        if value is None or field not in self.interned_fields:
+            return value
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, (list, tuple)):
+            value = tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+            return self._shared_values.setdefault(value, value)
+        return value
+
+
+class ContactRow(MutableMapping):
+    """Dict-like view of one row of a ContactTable.
+
+    Fields set to None are treated as missing, matching contact dicts that
+    simply leave such keys out.
+    """
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, field):
+        value = self._table.get_value(self._index, field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def get(self, field, default=None):
+        # Overridden because the Mapping default goes through KeyError
+        value = self._table.get_value(self._index, field)
+        return default if value is None else value
+
+    def __setitem__(self, field, value):
+        self._table.set_value(self._index, field, value)
+
+    def __delitem__(self, field):
+        if field not in self:
+            raise KeyError(field)
+        self._table.set_value(self._index, field, None)
+
+    def __iter__(self):
+        for field in self._table.fields:
+            if self._table.get_value(self._index, field) is not None:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, field):
+        return self._table.get_value(self._index, field) is not None
+
+    def __repr__(self):
+        return f"ContactRow({dict(self)!r})"
@@ -0,0 +1,143 @@
+import heapq
+import logging
+import threading
+from datetime import date, timedelta
+
+# Mirrors the day counts used by the Overdue formula in NotionManager
+SCHEDULE_DAYS = {
+    'Weekly': 7,
+    'Monthly': 30,
+    'Quarterly': 90,
+    'Yearly': 360,
+}
+
+
+class FollowUpIndex:
+    """Contacts with a Contact Schedule, ordered by their next due date.
+
+    The index is fed with the Notion pages a sync observes and answers
+    "who is due" queries locally. Entries live in a heap with lazy
+    invalidation: re-observing a page pushes a fresh entry and the old one
+    is skipped when read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._heap = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def observe_pages(self, pages, complete=False):
+        """Index the scheduled contacts among pages.
+
+        Pass complete=True when pages are every live page of the database,
+        e.g. from a full scan: indexed pages missing from them are dropped,
+        since queries never return archived or deleted pages.
+        """
+        with self._lock:
+            seen = set()
+            for page in pages:
+                self._observe(page)
+                seen.add(page.get('id'))
+            if complete:
+                for page_id in [page_id for page_id in self._entries if page_id not in seen]:
+                    del self._entries[page_id]
+            self._compact()
+        logging.info(f"Follow-up index now tracks {len(self._entries)} scheduled contacts")
+
+    def remove(self, page_id):
+        with self._lock:
+            self._entries.pop(page_id, None)
+
+    def due(self, limit=20, as_of=None, within_days=0):
+        """Return up to limit contacts due by as_of + within_days, most overdue first."""
+        cutoff = (as_of or date.today()) + timedelta(days=within_days)
+        results = []
+        with self._lock:
+            # Walk the heap array as a tree so the top entries can be read
+            # without popping them.
+            frontier = [(self._heap[0], 0)] if self._heap else []
+            while frontier and len(results) < limit:
+                (due_date, seq, page_id), position = heapq.heappop(frontier)
+                if due_date > cutoff:
+                    break
+                entry = self._entries.get(page_id)
+                if entry and entry['seq'] == seq:
+                    results.append(self._to_result(entry))
+                for child in (2 * position + 1, 2 * position + 2):
+                    if child < len(self._heap):
+                        heapq.heappush(frontier, (self._heap[child], child))
+        return results
+
+    def _observe(self, page):
+        page_id = page.get('id')
+        if not page_id:
+            return
+        properties = page.get('properties', {})
+        if page.get('archived') or page.get('in_trash'):
+            self._entries.pop(page_id, None)
+            return
+
+        schedule = self._get_select_value(properties.get('Contact Schedule'))
+        if schedule not in SCHEDULE_DAYS:
+            self._entries.pop(page_id, None)
+            return
+
+        last_contacted = self._get_date_value(properties.get('Last Contacted'))
+        if last_contacted:
+            due_date = last_contacted + timedelta(days=SCHEDULE_DAYS[schedule])
+        else:
+            # Scheduled but never contacted counts as overdue straight away
+            due_date = date.min
+
+        self._counter += 1
+        self._entries[page_id] = {
+            'seq': self._counter,
+            'id': page_id,
+            'name': self._get_title_value(properties.get('Name')),
+            'linkedin_url': (properties.get('LinkedIn URL') or {}).get('url'),
+            'contact_schedule': schedule,
+            'last_contacted': last_contacted,
+            'due_date': due_date,
+        }
+        heapq.heappush(self._heap, (due_date, self._counter, page_id))
+
+    def _compact(self):
+        """Drop stale heap entries once they outnumber the live ones."""
+        if len(self._heap) <= 2 * len(self._entries) + 64:
+            return
+        self._heap = [(entry['due_date'], entry['seq'], page_id)
+                      for page_id, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _to_result(self, entry):
+        return {
+            'id': entry['id'],
+            'name': entry['name'],
+            'linkedin_url': entry['linkedin_url'],
+            'contact_schedule': entry['contact_schedule'],
+            'last_contacted': entry['last_contacted'].isoformat() if entry['last_contacted'] else None,
+            'due_date': entry['due_date'].isoformat() if entry['last_contacted'] else None,
+        }
+
+    def _get_title_value(self, prop):
+        if not prop or not prop.get('title'):
+            return ''
+        return prop['title'][0].get('plain_text') or prop['title'][0]['text']['content']
+
+    def _get_select_value(self, prop):
+        if not prop or not prop.get('select'):
+            return None
+        return prop['select'].get('name')
+
+    def _get_date_value(self, prop):
+        if not prop or not prop.get('date') or not prop['date'].get('start'):
+            return None
+        try:
+            return date.fromisoformat(prop['date']['start'][:10])
+        except ValueError:
+            logging.warning(f"Ignoring unparseable date: {prop['date']['start']}")
+            return None
@@ -0,0 +1,108 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+from time import perf_counter, time
+
+PROFILE_SUFFIX = '.pstats'
+TRACE_SUFFIX = '.notion-trace.jsonl'
+
+
+class JobProfiler:
+    """Opt-in profiling for a single sync job.
+
+    With profile=True the job runs under cProfile and the stats are written
+    as a pstats file. With trace_notion=True every Notion API request made
+    through an instrumented client is recorded with its timing. Jobs that
+    enable neither never create a JobProfiler, so they pay nothing.
+    """
+
+    def __init__(self, job_id, output_dir, profile=False, trace_notion=False):
+        self.job_id = job_id
+        self.output_dir = output_dir
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_notion = trace_notion
+        self.notion_calls = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_job(cls, sync_data, output_dir):
+        """Return a profiler for the job, or None if it did not opt in."""
+        if not sync_data.get('profile') and not sync_data.get('trace_notion'):
+            return None
+        return cls(sync_data['job_id'], output_dir,
+                   profile=sync_data.get('profile', False),
+                   trace_notion=sync_data.get('trace_notion', False))
+
+    def runcall(self, func, *args, **kwargs):
+        if self.profiler is None:
+            return func(*args, **kwargs)
+        return self.profiler.runcall(func, *args, **kwargs)
+
+    def instrument_client(self, client):
+        """Record path, method, status and duration of each request sent by client."""
+        if not self.trace_notion:
+            return client
+        send_request = client.request
+
+        def traced_request(path, method, query=None, body=None, auth=None):
+            started_at = time()
+            start = perf_counter()
+            error = None
+            try:
+                return send_request(path, method, query=query, body=body, auth=auth)
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                raise
+            finally:
+                with self._lock:
+                    self.notion_calls.append({
+                        'started_at': started_at,
+                        'method': method,
+                        'path': path,
+                        'duration_ms': round((perf_counter() - start) * 1000, 2),
+                        'error': error,
+                    })
+
+        client.request = traced_request
+        return client
+
+    def save(self):
+        """Write the collected profile and trace. Returns the artifact kinds written."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        artifacts = []
+        if self.profiler is not None:
+            self.profiler.dump_stats(profile_path(self.output_dir, self.job_id))
+            artifacts.append('profile')
+        if self.trace_notion:
+            with open(trace_path(self.output_dir, self.job_id), 'w') as trace_file:
+                for call in self.notion_calls:
+                    trace_file.write(json.dumps(call) + '\n')
+            artifacts.append('notion_trace')
+            total_ms = sum(call['duration_ms'] for call in self.notion_calls)
+            logging.info(f"Job {self.job_id} made {len(self.notion_calls)} Notion API calls totalling {total_ms:.0f} ms")
+        logging.info(f"Saved {', '.join(artifacts)} for job {self.job_id} to {self.output_dir}")
+        return artifacts
+
+
+def profile_path(output_dir, job_id):
+    return os.path.join(output_dir, f"{job_id}{PROFILE_SUFFIX}")
+
+
+def trace_path(output_dir, job_id):
+    return os.path.join(output_dir, f"{job_id}{TRACE_SUFFIX}")
+
+
+def prune_artifacts(output_dir, keep):
+    """Delete all but the newest keep artifact files in output_dir."""
+    if not os.path.isdir(output_dir):
+        return
+    paths = [os.path.join(output_dir, name) for name in os.listdir(output_dir)
+             if name.endswith(PROFILE_SUFFIX) or name.endswith(TRACE_SUFFIX)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"Error removing old profiling artifact {path}: {str(e)}")
@@ -1,43 +1,71 @@
-import pandas as pd
+import csv
 import logging
+import os
+from contact_table import ContactTable
+
+# Bytes read from the start of an export to find its header row
+SNIFF_BYTES = 8 * 1024
+# Lines of notes LinkedIn may put above the header row
+MAX_PREAMBLE_LINES = 10
+
+
+class InvalidExportError(ValueError):
+    """The file is not a LinkedIn Connections export this parser can read."""
+
 
 class LinkedInParser:
-    def parse_linkedin_export(self, file_path='Connections.csv'):
+    # Expected column names and the header names they appear under
+    column_mappings = {
+        'First Name': ['First Name', 'First_Name', 'FirstName'],
+        'Last Name': ['Last Name', 'Last_Name', 'LastName'],
+        'Email Address': ['Email Address', 'Email_Address', 'EmailAddress', 'Email'],
+        'Company': ['Company', 'Organization', 'Company Name'],
+        'Position': ['Position', 'Job Title', 'Title'],
+        'Connected On': ['Connected On', 'Connection Date', 'Connected_On'],
+        'Profile URL': ['URL', 'LinkedIn URL', 'Public Profile URL']
+    }
+    # Columns a sync cannot do without: contacts are matched by profile URL
+    required_columns = ['First Name', 'Last Name', 'Profile URL']
+
+    def parse_linkedin_export(self, file_path='Connections.csv', layout=None):
+        """Parse a LinkedIn Connections.csv export into a ContactTable.
+
+        layout is the result of sniff_export for this file; it is sniffed
+        here if not given.
+        """
+        # pandas is imported on first parse to keep it out of server startup
+        import pandas as pd
+
         try:
-            # Skip the first three lines as they contain export notes
-            df = pd.read_csv(file_path, skiprows=3)
-            contacts = []
-
-            # Define mappings for expected column names
-            column_mappings = {
-                'First Name': ['First Name', 'First_Name', 'FirstName'],
-                'Last Name': ['Last Name', 'Last_Name', 'LastName'],
-                'Email Address': ['Email Address', 'Email_Address', 'EmailAddress', 'Email'],
-                'Company': ['Company', 'Organization', 'Company Name'],
-                'Position': ['Position', 'Job Title', 'Title'],
-                'Connected On': ['Connected On', 'Connection Date', 'Connected_On'],
-                'Profile URL': ['URL', 'LinkedIn URL', 'Public Profile URL']
-            }
-
-            # Find the actual column names in the CSV
-            actual_columns = {}
-            for expected_col, possible_names in column_mappings.items():
-                found_col = next((col for col in df.columns if col in possible_names), None)
-                if found_col:
-                    actual_columns[expected_col] = found_col
-                else:
+            if layout is None:
+                layout = self.sniff_file(file_path)
+            # Read only the columns we map, below the export notes
+            actual_columns = layout['columns']
+            df = pd.read_csv(file_path, skiprows=layout['skiprows'], usecols=list(actual_columns.values()))
+            for expected_col in self.column_mappings:
+                if expected_col not in actual_columns:
                     logging.warning(f"Column '{expected_col}' not found in the CSV. Using default values.")
 
-            for _, row in df.iterrows():
-                # Convert all values to strings and handle NaN/None values
-                contact = {
-                    "Name": f"{str(row[actual_columns.get('First Name', '')]).strip() if pd.notna(row[actual_columns.get('First Name', '')]) else ''} {str(row[actual_columns.get('Last Name', '')]).strip() if pd.notna(row[actual_columns.get('Last Name', '')]) else ''}".strip(),
-                    "LinkedIn URL": str(row.get(actual_columns.get('Profile URL', ''), '')).strip() if pd.notna(row.get(actual_columns.get('Profile URL', ''), '')) else '',
-                    "Company": str(row.get(actual_columns.get('Company', ''), '')).strip() if pd.notna(row.get(actual_columns.get('Company', ''), '')) else '',
-                    "Position": str(row.get(actual_columns.get('Position', ''), '')).strip() if pd.notna(row.get(actual_columns.get('Position', ''), '')) else '',
-                    "Connected On": self._format_date(str(row.get(actual_columns.get('Connected On', ''), '')).strip() if pd.notna(row.get(actual_columns.get('Connected On', ''), '')) else ''),
-                }
-                contacts.append(contact)
+            def column_values(expected_col):
+                # Convert all values to stripped strings, with '' for NaN/None
+                # values and for columns missing from the export
+                if expected_col not in actual_columns:
+                    return [''] * len(df)
+                column = df[actual_columns[expected_col]]
+                return column.where(column.notna(), '').astype(str).str.strip().tolist()
+
+            first_names = column_values('First Name')
+            last_names = column_values('Last Name')
+            connected_on = column_values('Connected On')
+            # Export dates repeat heavily, so each distinct one is formatted once
+            formatted_dates = {value: self._format_date(value) for value in set(connected_on)}
+            contacts = ContactTable.from_columns({
+                "Name": [f"{first} {last}".strip() for first, last in zip(first_names, last_names)],
+                "LinkedIn URL": column_values('Profile URL'),
+                "Company": column_values('Company'),
+                "Position": column_values('Position'),
+                "Connected On": [formatted_dates[value] for value in connected_on],
+            })
 
             logging.info(f"Successfully parsed {len(contacts)} contacts from LinkedIn export")
             return contacts
@@ -45,6 +73,70 @@ class LinkedInParser:
             logging.error(f"Error parsing LinkedIn export: {str(e)}")
             raise
 
+    def sniff_file(self, file_path):
+        """Sniff the layout of an export file on disk. See sniff_export."""
+        with open(file_path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+        return self.sniff_export(head, os.path.getsize(file_path))
+
+    def sniff_export(self, head, total_size):
+        """Find the header row of an export from its first bytes.
+
+        Returns the layout as a dict with the number of preamble lines to
+        skip, the actual header name of each expected column found, and
+        the number of data rows estimated from total_size. Raises
+        InvalidExportError if no header row with the required columns is
+        found within the first MAX_PREAMBLE_LINES lines.
+        """
+        if not head.strip():
+            raise InvalidExportError('The file is empty')
+        lines = head.split(b'\n')
+        complete = len(head) >= total_size
+        if not complete:
+            # The last line may have been cut off by the sniff
+            lines = lines[:-1]
+
+        best_columns = {}
+        offset = 0
+        for index, line in enumerate(lines[:MAX_PREAMBLE_LINES]):
+            offset += len(line) + 1
+            text = line.decode('utf-8-sig' if index == 0 else 'utf-8', errors='replace').rstrip('\r')
+            columns = self._resolve_columns(next(csv.reader([text]), []))
+            if all(column in columns for column in self.required_columns):
+                data_lines = [data_line for data_line in lines[index + 1:] if data_line.strip()]
+                return {
+                    'skiprows': index,
+                    'columns': columns,
+                    'estimated_rows': self._estimate_rows(data_lines, complete, total_size - offset),
+                }
+            if len(columns) > len(best_columns):
+                best_columns = columns
+
+        if len(best_columns) >= 2:
+            missing = [column for column in self.required_columns if column not in best_columns]
+            raise InvalidExportError(
+                'The export is missing required columns: ' +
+                ', '.join(f"{column} (one of {', '.join(self.column_mappings[column])})" for column in missing))
+        raise InvalidExportError(
+            'This does not look like a LinkedIn Connections export. '
+            'Upload the Connections.csv file from your LinkedIn data download')
+
+    def _resolve_columns(self, header):
+        """Map each expected column to its name in header, leaving out those not present."""
+        columns = {}
+        for expected_col, possible_names in self.column_mappings.items():
+            found_col = next((col for col in header if col in possible_names), None)
+            if found_col:
+                columns[expected_col] = found_col
+        return columns
+
+    def _estimate_rows(self, data_lines, complete, data_size):
+        """Estimate data rows from the sniffed lines and the size of the data section."""
+        if complete or not data_lines:
+            return len(data_lines)
+        average_line_size = sum(len(line) + 1 for line in data_lines) / len(data_lines)
+        return max(round(data_size / average_line_size), len(data_lines))
+
     def _format_date(self, date_str):
         """Format the date string to a consistent format"""
         if not date_str:
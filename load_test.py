@@ -0,0 +1,382 @@
+"""Load test for the /sync endpoint and the Socket.IO progress channel.
+
+Starts a fake Notion backend on localhost and, unless --server-url is given,
+a web_server.py process pointed at it. Then, for each concurrency level, N
+virtual users each open a Socket.IO connection and post a synthetic
+LinkedIn export to /sync at the same moment. Per user it records:
+
+- admission latency: time until /sync answers
+- queue wait: time from admission until the worker's first progress event
+- event lag: difference between an event's sent_at and its arrival
+- end-to-end time: from posting the file until the completed, error or cancelled event
+
+The report is written as JSON and can be compared against an earlier run
+with --compare.
+
+Needs the Socket.IO client extras: pip install "python-socketio[client]"
+
+Usage:
+    python load_test.py --concurrency 1,2,4,8 --rows 200 --output report.json
+    python load_test.py --concurrency 1,2,4,8 --compare report.json
+    python load_test.py --concurrency 4 --rows 3000,20 --stagger-ms 500  # mixed sizes
+
+To test several server processes, start them with
+NOTION_BASE_URL=http://127.0.0.1:<notion port> and pass them all:
+    python load_test.py --notion-port 8555 --server-url http://127.0.0.1:3001,http://127.0.0.1:3002
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import socketio
+except ImportError:  # pragma: no cover - only needed when running the load test
+    socketio = None
+
+COMPARED_METRICS = ['admission_ms', 'queue_wait_ms', 'event_lag_ms', 'end_to_end_ms']
+
+
+class FakeNotionBackend:
+    """Minimal in-memory stand-in for the Notion endpoints the sync uses."""
+
+    def __init__(self, latency_ms=0, port=0):
+        self.latency_ms = latency_ms
+        self.databases = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def handle(self, method, path, body):
+        with self._lock:
+            self.request_count += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        parts = path.strip('/').split('/')[1:]  # drop the "v1" prefix
+        with self._lock:
+            if parts[0] == 'databases':
+                pages = self.databases.setdefault(parts[1], {})
+                if len(parts) == 3 and parts[2] == 'query':
+                    return 200, self._query(pages, body)
+                return 200, {'object': 'database', 'id': parts[1], 'properties': body.get('properties', {})}
+            if parts[0] == 'pages' and method == 'POST':
+                page_id = uuid.uuid4().hex
+                page = {'object': 'page', 'id': page_id, 'archived': False, 'properties': body.get('properties', {})}
+                self.databases.setdefault(body['parent']['database_id'], {})[page_id] = page
+                return 200, page
+            if parts[0] == 'pages' and method == 'PATCH':
+                for pages in self.databases.values():
+                    if parts[1] in pages:
+                        page = pages[parts[1]]
+                        page['properties'].update(body.get('properties', {}))
+                        page['archived'] = body.get('archived', page['archived'])
+                        return 200, page
+        return 404, {'object': 'error', 'status': 404, 'code': 'object_not_found', 'message': path}
+
+    def _query(self, pages, body):
+        results = [page for page in pages.values() if not page['archived']]
+        conditions = (body.get('filter') or {}).get('or')
+        if conditions:
+            urls = {condition['url']['equals'] for condition in conditions}
+            results = [page for page in results
+                       if (page['properties'].get('LinkedIn URL') or {}).get('url') in urls]
+        start = int(body.get('start_cursor') or 0)
+        page_size = body.get('page_size', 100)
+        has_more = start + page_size < len(results)
+        return {
+            'object': 'list',
+            'results': results[start:start + page_size],
+            'has_more': has_more,
+            'next_cursor': str(start + page_size) if has_more else None,
+        }
+
+    def _make_handler(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                status, payload = backend.handle(self.command, self.path.split('?')[0], body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def build_export(rows, seed):
+    """Return a synthetic LinkedIn Connections.csv with rows contacts."""
+    lines = [
+        'Notes:',
+        '"When exporting your connection data, you may notice that some of the email addresses are missing."',
+        '',
+        'First Name,Last Name,URL,Email Address,Company,Position,Connected On',
+    ]
+    for index in range(rows):
+        lines.append(
+            f'User{index},Load{seed},https://www.linkedin.com/in/load-{seed}-{index},,'
+            f'Company {index % 50},Software Engineer {index % 7},{1 + index % 28:02d} Mar 2024'
+        )
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def encode_multipart(fields, file_field, filename, file_data):
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode('utf-8')
+    body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+             f'Content-Type: text/csv\r\n\r\n').encode('utf-8')
+    body += file_data + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return bytes(body), f'multipart/form-data; boundary={boundary}'
+
+
+def run_virtual_user(server_url, rows, seed, job_timeout, start_barrier, delay):
+    result = {'rows': rows, 'outcome': None, 'admission_ms': None, 'queue_wait_ms': None,
+              'end_to_end_ms': None, 'event_lag_ms': []}
+    first_event_at = []
+    finished = threading.Event()
+    sio = socketio.Client(reconnection=False)
+
+    @sio.on('sync_progress')
+    def on_progress(data):
+        received_at = time.time()
+        if 'sent_at' in data:
+            result['event_lag_ms'].append((received_at - data['sent_at']) * 1000)
+        if not first_event_at:
+            first_event_at.append(received_at)
+        if data.get('status') in ('completed', 'error', 'cancelled'):
+            result['outcome'] = data['status']
+            result['finished_at'] = received_at
+            finished.set()
+
+    try:
+        sio.connect(server_url, transports=['websocket'])
+        body, content_type = encode_multipart(
+            {'socket_id': sio.get_sid(), 'notion_token': f'secret-load-{seed}',
+             'notion_database_id': f'load-db-{seed}'},
+            'linkedin_file', 'Connections.csv', build_export(rows, seed))
+        start_barrier.wait()
+        time.sleep(delay)
+
+        posted_at = time.time()
+        request = urllib.request.Request(f'{server_url}/sync', data=body, method='POST',
+                                         headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=job_timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            result['outcome'] = 'rejected'
+            result['detail'] = json.loads(e.read() or b'{}').get('error_type')
+            return result
+        admitted_at = time.time()
+        result['admission_ms'] = (admitted_at - posted_at) * 1000
+
+        if not finished.wait(job_timeout):
+            result['outcome'] = 'timeout'
+            return result
+        result['queue_wait_ms'] = (first_event_at[0] - admitted_at) * 1000 if first_event_at else None
+        result['end_to_end_ms'] = (result['finished_at'] - posted_at) * 1000
+        return result
+    except Exception as e:
+        result['outcome'] = 'client_error'
+        result['detail'] = str(e)
+        return result
+    finally:
+        if sio.connected:
+            sio.disconnect()
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'p50': round(statistics.median(values), 1),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+        'max': round(values[-1], 1),
+    }
+
+
+def run_level(server_urls, concurrency, row_sizes, stagger, job_timeout, seed_prefix):
+    """Run one round; user i uses server i % len(server_urls) and uploads
+    row_sizes[i % len(row_sizes)] rows, i * stagger seconds late."""
+    barrier = threading.Barrier(concurrency)
+    results = [None] * concurrency
+
+    def worker(index):
+        results[index] = run_virtual_user(server_urls[index % len(server_urls)], row_sizes[index % len(row_sizes)], f'{seed_prefix}-{index}',
+                                          job_timeout, barrier, index * stagger)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    outcomes = {}
+    for result in results:
+        outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+    return {
+        'concurrency': concurrency,
+        'outcomes': outcomes,
+        'error_details': sorted({r['detail'] for r in results if r.get('detail')})[:5],
+        'admission_ms': summarize([r['admission_ms'] for r in results if r['admission_ms'] is not None]),
+        'queue_wait_ms': summarize([r['queue_wait_ms'] for r in results if r['queue_wait_ms'] is not None]),
+        'event_lag_ms': summarize([lag for r in results for lag in r['event_lag_ms']]),
+        'end_to_end_ms': summarize([r['end_to_end_ms'] for r in results if r['end_to_end_ms'] is not None]),
+        'end_to_end_ms_by_rows': {
+            str(rows): summarize([r['end_to_end_ms'] for r in results
+                                  if r['rows'] == rows and r['end_to_end_ms'] is not None])
+            for rows in sorted(set(row_sizes))
+        },
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(backend_url):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), NOTION_BASE_URL=backend_url)
+    process = subprocess.Popen([sys.executable, 'web_server.py'], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('web_server.py exited during startup')
+        try:
+            urllib.request.urlopen(server_url, timeout=1).read()
+            return process, server_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('web_server.py did not start within 30s')
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(report, baseline=None):
+    baseline_levels = {level['concurrency']: level for level in (baseline or {}).get('levels', [])}
+    for level in report['levels']:
+        print(f"concurrency {level['concurrency']}: {level['outcomes']}")
+        for detail in level.get('error_details', []):
+            print(f"  error: {detail}")
+        previous = baseline_levels.get(level['concurrency'])
+        for metric in COMPARED_METRICS:
+            current = level[metric]
+            line = f"  {metric:<14} {json.dumps(current)}"
+            old = previous and previous.get(metric)
+            if current and old and old['p95']:
+                change = (current['p95'] - old['p95']) / old['p95'] * 100
+                line += f"  (p95 {old['p95']} -> {current['p95']}, {change:+.0f}%)"
+            print(line)
+        if len(level['end_to_end_ms_by_rows']) > 1:
+            for rows, summary in level['end_to_end_ms_by_rows'].items():
+                print(f"  end_to_end_ms for {rows} rows: {json.dumps(summary)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', default='1,2,4,8',
+                        help='comma-separated numbers of simultaneous users')
+    parser.add_argument('--rows', default='100',
+                        help='contacts per synthetic export; a comma-separated list is assigned to users in turn')
+    parser.add_argument('--stagger-ms', type=float, default=0,
+                        help='delay between consecutive users posting their export')
+    parser.add_argument('--notion-latency-ms', type=float, default=0,
+                        help='artificial latency added to every fake Notion request')
+    parser.add_argument('--job-timeout', type=float, default=600, help='seconds to wait for each job')
+    parser.add_argument('--server-url',
+                        help='comma-separated URLs of already running servers to use instead of starting one')
+    parser.add_argument('--notion-port', type=int, default=0, help='port for the fake Notion backend')
+    parser.add_argument('--output', default='load_test_report.json', help='where to write the JSON report')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args()
+
+    if socketio is None:
+        sys.exit('The load test needs the Socket.IO client: pip install "python-socketio[client]"')
+    logging.basicConfig(level=logging.WARNING)
+
+    backend = FakeNotionBackend(latency_ms=args.notion_latency_ms, port=args.notion_port).start()
+    process = None
+    if args.server_url:
+        server_urls = args.server_url.split(',')
+    else:
+        process, server_url = start_server(backend.url)
+        server_urls = [server_url]
+
+    row_sizes = [int(value) for value in args.rows.split(',')]
+    run_id = uuid.uuid4().hex[:8]
+    levels = []
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            levels.append(run_level(server_urls, concurrency, row_sizes, args.stagger_ms / 1000,
+                                    args.job_timeout, f'{run_id}-{concurrency}'))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        backend.stop()
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'parameters': {'rows': row_sizes, 'stagger_ms': args.stagger_ms, 'servers': len(server_urls),
+                       'notion_latency_ms': args.notion_latency_ms},
+        'fake_notion_requests': backend.request_count,
+        'levels': levels,
+    }
+    with open(args.output, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Memory benchmark for the sync working set of parsed LinkedIn contacts.
+
+Builds a synthetic export, parses and classifies it once into the
+ContactTable used by the sync and once into a list of dicts (one dict per
+contact, as the parser used to return), and reports the memory each
+representation retains with tracemalloc.
+
+Usage:
+    python memory_benchmark.py --rows 50000
+    python memory_benchmark.py --rows 50000 --companies 500 --positions 200
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from contact_classifier import ContactClassifier
+from linkedin_parser import LinkedInParser
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+TITLES = ['Software Engineer', 'Product Manager', 'Director of Sales', 'Data Scientist', 'CEO',
+          'Marketing Lead', 'Consultant', 'Account Executive', 'HR Business Partner', 'Founder']
+
+
+def build_export(rows, companies, positions, seed=0):
+    """Return a synthetic Connections.csv with a given number of distinct companies and positions."""
+    rng = random.Random(seed)
+    lines = [
+        'Notes:',
+        '"When exporting your connection data, you may notice that some of the email addresses are missing."',
+        '',
+        'First Name,Last Name,URL,Email Address,Company,Position,Connected On',
+    ]
+    for index in range(rows):
+        company = f'Company {rng.randrange(companies)} Bank' if index % 3 == 0 else f'Company {rng.randrange(companies)}'
+        position = f'{TITLES[index % len(TITLES)]} {rng.randrange(positions)}'
+        connected_on = f'{rng.randint(1, 28):02d} {rng.choice(MONTHS)} {rng.randint(2012, 2024)}'
+        lines.append(f'User{index},Person{index},https://www.linkedin.com/in/user-{index},,'
+                     f'{company},{position},{connected_on}')
+    return '\n'.join(lines) + '\n'
+
+
+def parse_as_dicts(file_path):
+    """Parse the export into one dict per contact, the representation ContactTable replaced."""
+    import pandas as pd
+
+    parser = LinkedInParser()
+    df = pd.read_csv(file_path, skiprows=3)
+    contacts = []
+    for _, row in df.iterrows():
+        def value(column):
+            return str(row[column]).strip() if pd.notna(row[column]) else ''
+        contacts.append({
+            "Name": f"{value('First Name')} {value('Last Name')}".strip(),
+            "LinkedIn URL": value('URL'),
+            "Company": value('Company'),
+            "Position": value('Position'),
+            "Connected On": parser._format_date(value('Connected On')),
+        })
+    return contacts
+
+
+def parse_as_table(file_path):
+    return LinkedInParser().parse_linkedin_export(file_path)
+
+
+def measure(build, file_path):
+    """Return (retained bytes, peak bytes, seconds) for building and classifying the contacts."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    contacts = build(file_path)
+    ContactClassifier().classify_contacts(contacts)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del contacts
+    return retained, peak, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--companies', type=int, default=5000, help='distinct companies in the export')
+    parser.add_argument('--positions', type=int, default=300, help='distinct position suffixes per title')
+    args = parser.parse_args()
+
+    # Import pandas up front so its own allocations are not counted
+    import pandas  # noqa: F401
+
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as export:
+        export.write(build_export(args.rows, args.companies, args.positions))
+    try:
+        results = {
+            'list of dicts': measure(parse_as_dicts, export.name),
+            'ContactTable': measure(parse_as_table, export.name),
+        }
+    finally:
+        os.remove(export.name)
+
+    print(f"{args.rows} contacts, {args.companies} companies, {args.positions * len(TITLES)} positions")
+    print(f"{'representation':<16}{'retained MiB':>14}{'bytes/contact':>15}{'peak MiB':>10}{'seconds':>9}")
+    for name, (retained, peak, seconds) in results.items():
+        print(f"{name:<16}{retained / 2**20:>14.1f}{retained / args.rows:>15.0f}{peak / 2**20:>10.1f}{seconds:>9.2f}")
+    baseline = results['list of dicts'][0]
+    print(f"ContactTable retains {1 - results['ContactTable'][0] / baseline:.0%} less memory")
+
+
+if __name__ == '__main__':
+    main()
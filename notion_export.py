@@ -0,0 +1,134 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+
+from notion_manager import NotionManager
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+# Separator used to fit multi_select values into a single CSV cell
+CSV_LIST_SEPARATOR = '; '
+
+
+def _plain_text(parts):
+    return ''.join(part.get('plain_text') or part.get('text', {}).get('content', '') for part in parts or [])
+
+
+def _date(value):
+    if not value:
+        return None
+    if value.get('end'):
+        return f"{value['start']}/{value['end']}"
+    return value['start']
+
+
+def _option(value):
+    return value['name'] if value else None
+
+
+def _formula(value):
+    if not value:
+        return None
+    result = value.get(value.get('type'))
+    return _date(result) if value.get('type') == 'date' else result
+
+
+PROPERTY_FLATTENERS = {
+    'title': _plain_text,
+    'rich_text': _plain_text,
+    'date': _date,
+    'select': _option,
+    'status': _option,
+    'multi_select': lambda value: [option['name'] for option in value or []],
+    'url': lambda value: value,
+    'email': lambda value: value,
+    'phone_number': lambda value: value,
+    'number': lambda value: value,
+    'checkbox': lambda value: value,
+    'formula': _formula,
+}
+
+
+def flatten_property(prop):
+    """Reduce a Notion property value to a plain value, or None if its type is not exported."""
+    kind = prop.get('type') or next((key for key in PROPERTY_FLATTENERS if key in prop), None)
+    if kind not in PROPERTY_FLATTENERS:
+        return None
+    return PROPERTY_FLATTENERS[kind](prop.get(kind))
+
+
+def flatten_page(page):
+    row = {
+        'Page ID': page.get('id'),
+        'Page URL': page.get('url'),
+        'Last Edited': page.get('last_edited_time'),
+    }
+    for name, prop in page.get('properties', {}).items():
+        row[name] = flatten_property(prop)
+    return row
+
+
+def export_chunks(page_batches, export_format):
+    """Yield the export as text, one chunk per batch of pages.
+
+    page_batches is an iterable of page lists such as
+    NotionManager.iter_contact_pages(), so only one query response is held
+    in memory at a time. CSV columns are taken from the first page.
+    """
+    columns = None
+    for pages in page_batches:
+        buffer = io.StringIO()
+        if export_format == 'jsonl':
+            for page in pages:
+                buffer.write(json.dumps(flatten_page(page), ensure_ascii=False) + '\n')
+        elif pages:
+            rows = [flatten_page(page) for page in pages]
+            write_header = columns is None
+            if write_header:
+                columns = list(rows[0])
+            writer = csv.DictWriter(buffer, columns, extrasaction='ignore')
+            if write_header:
+                writer.writeheader()
+            for row in rows:
+                writer.writerow({
+                    key: CSV_LIST_SEPARATOR.join(value) if isinstance(value, list) else value
+                    for key, value in row.items()
+                })
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Export a Notion CRM database as CSV or JSONL. The token is read from NOTION_TOKEN, '
+                    'and the database ID from NOTION_DATABASE_ID unless given as an option.')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--output', help='file to write, defaults to standard output')
+    parser.add_argument('--database-id', default=os.getenv('NOTION_DATABASE_ID'))
+    args = parser.parse_args(argv)
+    token = os.getenv('NOTION_TOKEN')
+    if not token or not args.database_id:
+        parser.error('NOTION_TOKEN and a database ID are required')
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    notion_manager = NotionManager(token=token, database_id=args.database_id, check_schema=False)
+
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for chunk in export_chunks(notion_manager.iter_contact_pages(), args.format):
+            output.write(chunk)
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,64 @@
-from notion_client import Client
 from datetime import datetime, timedelta
 import logging
+import math
 import os
+import time
+
+# Notion returns at most 100 pages per query and caps compound filters at 100
+# conditions, so both the page size and the URL chunk size are bounded by it.
+QUERY_PAGE_SIZE = 100
+URL_FILTER_CHUNK_SIZE = 100
+# Notion allows an average of three requests per second per integration
+MIN_WRITE_INTERVAL = 0.35
+
+
+class SyncCancelled(Exception):
+    """Raised at a safe point when a running sync has been asked to stop."""
+
+    def __init__(self, error_type, message):
+        super().__init__(message)
+        self.error_type = error_type
 
 
 class NotionManager:
 
-    def __init__(self):
-        self.client = Client(auth=os.getenv("NOTION_TOKEN"))
-        self.database_id = os.getenv("NOTION_DATABASE_ID")
-        self.ensure_database_exists()
+    # Page counts seen by the last full scan of each database, used to
+    # estimate what another full scan would cost.
+    _known_database_sizes = {}
+
+    def __init__(self, api_tracer=None, check_cancelled=None, token=None, database_id=None, check_schema=True):
+        self.token = token or os.getenv("NOTION_TOKEN")
+        self.database_id = database_id or os.getenv("NOTION_DATABASE_ID")
+        # Read-only callers such as the export pass False so that connecting
+        # never adds or updates database properties
+        self.check_schema = check_schema
+        self.api_tracer = api_tracer
+        # Called between the requests of long reads and bulk writes; raises
+        # SyncCancelled to stop them
+        self.check_cancelled = check_cancelled
+        self._client = None
+        self._last_write_time = 0.0
+
+    @property
+    def client(self):
+        """Notion client, connected (and schema-checked unless check_schema is False) on first use."""
+        if self._client is None:
+            # notion_client is imported lazily to keep it out of server startup
+            from notion_client import Client
+            options = {"auth": self.token}
+            # Lets the load test point syncs at a local fake Notion backend
+            if os.getenv("NOTION_BASE_URL"):
+                options["base_url"] = os.getenv("NOTION_BASE_URL")
+            self._client = Client(**options)
+            if self.api_tracer is not None:
+                self.api_tracer.instrument_client(self._client)
+            if self.check_schema:
+                try:
+                    self.ensure_database_exists()
+                except Exception:
+                    self._client = None
+                    raise
+        return self._client
 
     def ensure_database_exists(self):
         try:
@@ -129,6 +178,12 @@ class NotionManager:
                 "Updated": {
                     "checkbox": {}
                 },
+                "Removed from LinkedIn": {
+                    "checkbox": {}
+                },
+                "Classified": {
+                    "checkbox": {}
+                },
                 "Connection": {
                     "select": {
                         "options": [{
@@ -320,6 +375,9 @@ class NotionManager:
             if linkedin_url and linkedin_url.strip():
                 properties["LinkedIn URL"] = {"url": linkedin_url.strip()}
 
+            # Classified fields are only set when the classifier found a value
+            properties.update(self._classified_properties(contact))
+
             # Remove any properties with None or empty string values
             properties = {
                 k: v
@@ -356,6 +414,10 @@ class NotionManager:
                             }
                         }]
                     }
+                elif key == "Removed from LinkedIn":
+                    properties[key] = {"checkbox": bool(value)}
+
+            properties.update(self._classified_properties(updates))
 
             # Add property for udpated checkbox with checked status
             properties["Updated"] = {
@@ -373,22 +435,169 @@ class NotionManager:
             logging.error(f"Error updating contact: {str(e)}")
             # Don't raise the exception, just log it and continue
 
+    def add_classifications(self, page_id, contact):
+        """Fill in classified fields on an existing page without marking it Updated."""
+        try:
+            self.client.pages.update(page_id=page_id,
+                                     properties=self._classified_properties(contact))
+            logging.info(f"Added classifications to page ID: {page_id}")
+        except Exception as e:
+            logging.error(f"Error adding classifications: {str(e)}")
+            # Don't raise the exception, just log it and continue
+
+    def _throttle_write(self):
+        """Space out bulk writes to stay under Notion's rate limit."""
+        wait = self._last_write_time + MIN_WRITE_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_write_time = time.monotonic()
+
+    def tag_removed_contacts(self, page_ids, progress_callback=None):
+        """Check "Removed from LinkedIn" on each page. Returns the number tagged."""
+        return self._bulk_update(
+            page_ids, {"properties": {"Removed from LinkedIn": {"checkbox": True}}},
+            "tag", progress_callback)
+
+    def archive_contacts(self, page_ids, progress_callback=None):
+        """Archive each page. Returns the number archived."""
+        return self._bulk_update(page_ids, {"archived": True}, "archive",
+                                 progress_callback)
+
+    def _bulk_update(self, page_ids, payload, action, progress_callback):
+        done = 0
+        for index, page_id in enumerate(page_ids, 1):
+            if self.check_cancelled:
+                self.check_cancelled()
+            self._throttle_write()
+            try:
+                self.client.pages.update(page_id=page_id, **payload)
+                done += 1
+            except Exception as e:
+                logging.error(f"Failed to {action} page {page_id}: {str(e)}")
+            if progress_callback:
+                progress_callback(index, len(page_ids))
+        logging.info(f"Bulk {action}: {done} of {len(page_ids)} pages succeeded")
+        return done
+
+    def _classified_properties(self, contact):
+        properties = {}
+        for key in ["Industry", "Field of Work"]:
+            if contact.get(key):
+                properties[key] = {
+                    "multi_select": [{
+                        "name": name
+                    } for name in contact[key]]
+                }
+        if contact.get("Level"):
+            properties["Level"] = {"select": {"name": contact["Level"]}}
+        if properties:
+            # Pages are classified once, so values a user clears stay cleared
+            properties["Classified"] = {"checkbox": True}
+        return properties
+
     def get_all_contacts(self):
         try:
-            query_post = {"database_id": self.database_id}
-            results = self.client.databases.query(**query_post)
-            next_cur = results.get("next_cursor")
-            while results["has_more"]:
-                query_post["start_cursor"] = next_cur
-                db_query_ret = self.client.databases.query(**query_post)
-                next_cur = db_query_ret["next_cursor"]
-                results["results"] += db_query_ret["results"]
-                if next_cur is None:
-                    break
-            contacts = results.get("results", [])
+            contacts = [page for batch in self.iter_contact_pages() for page in batch]
             logging.info(
                 f"Retrieved {len(contacts)} contacts from the database")
             return contacts
+        except SyncCancelled:
+            raise
         except Exception as e:
             logging.error(f"Error retrieving contacts: {str(e)}")
             raise
+
+    def iter_contact_pages(self):
+        """Yield the database's pages one query response at a time.
+
+        Unlike get_all_contacts, only the current response is held in
+        memory, so callers can stream databases of any size. A scan read to
+        the end records the database size for estimate_lookup_requests.
+        """
+        query_post = {
+            "database_id": self.database_id,
+            "page_size": QUERY_PAGE_SIZE
+        }
+        page_count = 0
+        while True:
+            results = self.client.databases.query(**query_post)
+            page_count += len(results.get("results", []))
+            yield results.get("results", [])
+            next_cur = results.get("next_cursor")
+            if not results.get("has_more") or next_cur is None:
+                break
+            if self.check_cancelled:
+                self.check_cancelled()
+            query_post["start_cursor"] = next_cur
+        NotionManager._known_database_sizes[self.database_id] = page_count
+
+    def get_contacts_by_urls(self, linkedin_urls):
+        """Fetch only the pages whose LinkedIn URL is in linkedin_urls."""
+        try:
+            urls = sorted(set(url for url in linkedin_urls if url))
+            contacts = []
+            for start in range(0, len(urls), URL_FILTER_CHUNK_SIZE):
+                if self.check_cancelled:
+                    self.check_cancelled()
+                chunk = urls[start:start + URL_FILTER_CHUNK_SIZE]
+                query_post = {
+                    "database_id": self.database_id,
+                    "page_size": QUERY_PAGE_SIZE,
+                    "filter": {
+                        "or": [{
+                            "property": "LinkedIn URL",
+                            "url": {
+                                "equals": url
+                            }
+                        } for url in chunk]
+                    }
+                }
+                while True:
+                    results = self.client.databases.query(**query_post)
+                    contacts += results.get("results", [])
+                    next_cur = results.get("next_cursor")
+                    if not results.get("has_more") or next_cur is None:
+                        break
+                    query_post["start_cursor"] = next_cur
+            logging.info(
+                f"Retrieved {len(contacts)} contacts for {len(urls)} LinkedIn URLs"
+            )
+            return contacts
+        except SyncCancelled:
+            raise
+        except Exception as e:
+            logging.error(f"Error retrieving contacts by URL: {str(e)}")
+            raise
+
+    def estimate_lookup_requests(self, linkedin_urls):
+        """Estimate query requests for a targeted lookup and a full scan.
+
+        The full scan estimate is None until the database has been scanned
+        once by this process.
+        """
+        url_count = len(set(url for url in linkedin_urls if url))
+        targeted_requests = math.ceil(url_count / URL_FILTER_CHUNK_SIZE)
+        known_size = NotionManager._known_database_sizes.get(self.database_id)
+        full_scan_requests = None
+        if known_size is not None:
+            full_scan_requests = max(1, math.ceil(known_size / QUERY_PAGE_SIZE))
+        return targeted_requests, full_scan_requests
+
+    def prefers_full_scan(self, linkedin_urls, max_targeted_requests):
+        """Whether to load the pages needed to sync linkedin_urls by paging through the whole database.
+
+        Batched filtered queries are preferred when they are estimated to
+        need fewer requests than a full scan and no more than
+        max_targeted_requests.
+        """
+        targeted_requests, full_scan_requests = self.estimate_lookup_requests(
+            linkedin_urls)
+        use_targeted = targeted_requests <= max_targeted_requests
+        if full_scan_requests is not None:
+            use_targeted = use_targeted and targeted_requests < full_scan_requests
+        logging.info(
+            f"Lookup strategy: {'targeted' if use_targeted else 'full scan'} "
+            f"(targeted ~{targeted_requests} requests, full scan "
+            f"~{full_scan_requests if full_scan_requests is not None else 'unknown'} requests, "
+            f"crossover {max_targeted_requests})")
+        return not use_targeted
@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import socketio
+
+
+@contextmanager
+def _connect(path):
+    """Open an autocommit connection to path and close it afterwards."""
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        yield connection
+    finally:
+        connection.close()
+
+
+def _create_private_file(path):
+    """Create the database file readable only by its owner, as it holds tokens and contact data."""
+    if not os.path.exists(path):
+        os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+
+
+class SqliteJobQueue:
+    """Sync job queue shared by several processes through a SQLite file.
+
+    Web processes admit jobs with put() and worker processes claim them with
+    claim(). Jobs are claimed in the same order SyncScheduler uses: estimated
+    cost plus aging_rate times the admission time, passing over jobs for a
+    database that already has a claimed job. A claimed job whose worker
+    stops sending heartbeats for stale_after seconds is queued again.
+    """
+
+    def __init__(self, path, maxsize, aging_rate, stale_after):
+        self.path = path
+        self.maxsize = maxsize
+        self.aging_rate = aging_rate
+        self.stale_after = stale_after
+        _create_private_file(path)
+        with _connect(path) as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS sync_jobs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT UNIQUE NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority REAL NOT NULL,
+                    admitted_at REAL NOT NULL,
+                    worker_id TEXT,
+                    heartbeat_at REAL
+                )''')
+
+    def full(self):
+        """True when the number of unfinished jobs, claimed or not, has reached maxsize."""
+        with _connect(self.path) as connection:
+            count, = connection.execute('SELECT COUNT(*) FROM sync_jobs').fetchone()
+        return count >= self.maxsize
+
+    def put(self, job, cost):
+        admitted_at = time.time()
+        with _connect(self.path) as connection:
+            connection.execute(
+                'INSERT INTO sync_jobs (job_id, payload, priority, admitted_at) VALUES (?, ?, ?, ?)',
+                (job['job_id'], json.dumps(job), cost + self.aging_rate * admitted_at, admitted_at))
+
+    def claim(self, worker_id):
+        """Claim the next job for worker_id, or return None if none is waiting."""
+        now = time.time()
+        with _connect(self.path) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'UPDATE sync_jobs SET worker_id = NULL, heartbeat_at = NULL '
+                'WHERE worker_id IS NOT NULL AND heartbeat_at < ?', (now - self.stale_after,))
+            # Skip databases that already have a claimed job, so two jobs for
+            # one database never run at the same time
+            row = connection.execute(
+                'SELECT job_id, payload, admitted_at FROM sync_jobs WHERE worker_id IS NULL '
+                "AND json_extract(payload, '$.notion_database_id') NOT IN ("
+                "SELECT json_extract(payload, '$.notion_database_id') FROM sync_jobs WHERE worker_id IS NOT NULL) "
+                'ORDER BY priority, seq LIMIT 1').fetchone()
+            if row is not None:
+                connection.execute('UPDATE sync_jobs SET worker_id = ?, heartbeat_at = ? WHERE job_id = ?',
+                                   (worker_id, now, row[0]))
+            connection.execute('COMMIT')
+        if row is None:
+            return None
+        job = json.loads(row[1])
+        job['_admitted_at'] = row[2]
+        logging.info(f"Worker {worker_id} claimed job {row[0]}")
+        return job
+
+    def heartbeat(self, worker_id):
+        """Renew the claims on every job worker_id holds."""
+        with _connect(self.path) as connection:
+            connection.execute('UPDATE sync_jobs SET heartbeat_at = ? WHERE worker_id = ?', (time.time(), worker_id))
+
+    def finish(self, job_id, worker_id):
+        """Remove a finished job. Returns False if worker_id no longer held its claim."""
+        with _connect(self.path) as connection:
+            cursor = connection.execute('DELETE FROM sync_jobs WHERE job_id = ? AND worker_id = ?',
+                                        (job_id, worker_id))
+        return cursor.rowcount > 0
+
+
+class SqliteJobControl:
+    """Cancellation requests and client presence shared through a SQLite file.
+
+    Same interface as sync_scheduler.JobControl, for when the web process
+    that sees a cancel, a watch or a disconnect is not the worker running the job.
+    """
+
+    def __init__(self, path, forget_after=3600):
+        self.path = path
+        self.forget_after = forget_after
+        _create_private_file(path)
+        with _connect(path) as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS job_cancellations (
+                    job_id TEXT PRIMARY KEY,
+                    reason TEXT NOT NULL,
+                    requested_at REAL NOT NULL
+                )''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS job_watchers (
+                    job_id TEXT NOT NULL,
+                    sid TEXT NOT NULL,
+                    PRIMARY KEY (job_id, sid)
+                )''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS unwatched_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    unwatched_at REAL NOT NULL
+                )''')
+
+    def request_cancel(self, job_id, reason):
+        now = time.time()
+        with _connect(self.path) as connection:
+            connection.execute('INSERT OR REPLACE INTO job_cancellations VALUES (?, ?, ?)', (job_id, reason, now))
+            connection.execute('DELETE FROM job_cancellations WHERE requested_at < ?', (now - self.forget_after,))
+
+    def cancel_reason(self, job_id):
+        with _connect(self.path) as connection:
+            row = connection.execute('SELECT reason FROM job_cancellations WHERE job_id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def watch(self, job_id, sid):
+        with _connect(self.path) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('INSERT OR IGNORE INTO job_watchers VALUES (?, ?)', (job_id, sid))
+            connection.execute('DELETE FROM unwatched_jobs WHERE job_id = ?', (job_id,))
+            connection.execute('COMMIT')
+
+    def unwatch(self, sid):
+        with _connect(self.path) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            job_ids = [row[0] for row in connection.execute(
+                'SELECT job_id FROM job_watchers WHERE sid = ?', (sid,))]
+            connection.execute('DELETE FROM job_watchers WHERE sid = ?', (sid,))
+            for job_id in job_ids:
+                connection.execute(
+                    'INSERT OR REPLACE INTO unwatched_jobs SELECT ?, ? '
+                    'WHERE NOT EXISTS (SELECT 1 FROM job_watchers WHERE job_id = ?)',
+                    (job_id, time.time(), job_id))
+            connection.execute('DELETE FROM unwatched_jobs WHERE unwatched_at < ?',
+                               (time.time() - self.forget_after,))
+            connection.execute('COMMIT')
+
+    def unwatched_since(self, job_id):
+        with _connect(self.path) as connection:
+            row = connection.execute('SELECT unwatched_at FROM unwatched_jobs WHERE job_id = ?',
+                                     (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def forget_job(self, job_id):
+        with _connect(self.path) as connection:
+            connection.execute('DELETE FROM job_cancellations WHERE job_id = ?', (job_id,))
+            connection.execute('DELETE FROM job_watchers WHERE job_id = ?', (job_id,))
+            connection.execute('DELETE FROM unwatched_jobs WHERE job_id = ?', (job_id,))
+
+
+class SqlitePubSubManager(socketio.PubSubManager):
+    """Socket.IO client manager that relays events between processes through a SQLite file.
+
+    Every process appends the messages it publishes to a table and polls
+    for rows added by the others, so an emit from a worker process reaches a
+    client connected to any web process on the same host.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, channel='flask-socketio', write_only=False, logger=None,
+                 poll_interval=0.05, retention_seconds=300):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        _create_private_file(path)
+        with _connect(path) as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS socketio_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    payload BLOB NOT NULL
+                )''')
+
+    def _publish(self, data):
+        with _connect(self.path) as connection:
+            connection.execute('INSERT INTO socketio_messages (channel, created_at, payload) VALUES (?, ?, ?)',
+                               (self.channel, time.time(), pickle.dumps(data)))
+
+    def _listen(self):
+        with _connect(self.path) as connection:
+            last_id, = connection.execute('SELECT COALESCE(MAX(id), 0) FROM socketio_messages').fetchone()
+        last_cleanup = time.time()
+        while True:
+            with _connect(self.path) as connection:
+                rows = connection.execute(
+                    'SELECT id, payload FROM socketio_messages WHERE id > ? AND channel = ? ORDER BY id',
+                    (last_id, self.channel)).fetchall()
+                if time.time() - last_cleanup > self.retention_seconds:
+                    connection.execute('DELETE FROM socketio_messages WHERE created_at < ?',
+                                       (time.time() - self.retention_seconds,))
+                    last_cleanup = time.time()
+            for message_id, payload in rows:
+                last_id = message_id
+                yield payload
+            time.sleep(self.poll_interval)
@@ -0,0 +1,173 @@
+import heapq
+import threading
+from time import time
+
+
+class SyncScheduler:
+    """Queue of sync jobs ordered by shortest estimated job first, with aging.
+
+    A job's priority is its estimated remaining cost (in contact rows) minus
+    aging_rate rows for every second since it was admitted, so a large job
+    is eventually preferred over newly arriving small ones and cannot starve.
+    Because every job ages at the same rate, this ordering equals ordering
+    by cost + aging_rate * admitted_at, which never changes while a job
+    waits and can therefore be kept in a heap.
+
+    Jobs are run in slices: the worker takes a job, runs part of it and
+    hands it back with requeue() and its remaining cost, so smaller jobs
+    admitted in the meantime can run before the next slice.
+
+    Jobs with the same lane_key(job) never interleave: once a job of a lane
+    has started, other jobs of that lane are passed over until it is marked
+    done with task_done().
+    """
+
+    def __init__(self, maxsize, aging_rate, lane_key=None):
+        self.maxsize = maxsize
+        self.aging_rate = aging_rate
+        self.lane_key = lane_key
+        self._active_lanes = {}
+        self._heap = []
+        self._counter = 0
+        self._unfinished = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def full(self):
+        """True when the number of unfinished jobs, running or waiting, has reached maxsize."""
+        return self.unfinished_count() >= self.maxsize
+
+    def unfinished_count(self):
+        with self._condition:
+            return self._unfinished
+
+    def qsize(self):
+        with self._condition:
+            return len(self._heap)
+
+    def put(self, job, cost, admitted_at=None):
+        """Admit a new job with an estimated cost.
+
+        admitted_at defaults to now; jobs claimed from a shared queue pass
+        their original admission time so their aging carries over.
+        """
+        with self._condition:
+            self._unfinished += 1
+            self._push(job, cost, admitted_at or time())
+
+    def requeue(self, job, remaining_cost):
+        """Hand back a job that has more slices to run, keeping its admission time."""
+        with self._condition:
+            self._push(job, remaining_cost, job['_admitted_at'])
+
+    def get(self):
+        """Block until a runnable job is available and return it, or None once shut down."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                job = self._pop_runnable()
+                if job is not None:
+                    return job
+                self._condition.wait()
+
+    def task_done(self, job):
+        """Mark a job obtained from get() as finished, freeing its slot and lane."""
+        with self._condition:
+            self._unfinished -= 1
+            lane = self._lane(job)
+            if lane is not None and self._active_lanes.get(lane) == job['job_id']:
+                del self._active_lanes[lane]
+            self._condition.notify_all()
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _lane(self, job):
+        return self.lane_key(job) if self.lane_key else None
+
+    def _pop_runnable(self):
+        """Pop the best job whose lane is free or already its own, or return None."""
+        passed_over = []
+        job = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            lane = self._lane(entry[2])
+            if lane is None or self._active_lanes.setdefault(lane, entry[2]['job_id']) == entry[2]['job_id']:
+                job = entry[2]
+                break
+            passed_over.append(entry)
+        for entry in passed_over:
+            heapq.heappush(self._heap, entry)
+        return job
+
+    def _push(self, job, cost, admitted_at):
+        job['_admitted_at'] = admitted_at
+        self._counter += 1
+        priority = cost + self.aging_rate * admitted_at
+        heapq.heappush(self._heap, (priority, self._counter, job))
+        self._condition.notify()
+
+
+class JobControl:
+    """Cancellation requests and client presence for jobs run in this process.
+
+    Web handlers record them and the worker polls them between contacts, so a
+    job stops at the next safe point rather than mid-write. Presence is kept
+    per job: every socket watching a job is recorded, and the job is marked
+    unwatched only once the last of them disconnects, so a client that
+    reconnects with a new socket ID and watches the job again keeps it alive.
+    """
+
+    def __init__(self, forget_after=3600):
+        self.forget_after = forget_after
+        self._cancel_reasons = {}
+        self._watchers = {}
+        self._unwatched_at = {}
+        self._lock = threading.Lock()
+
+    def request_cancel(self, job_id, reason):
+        with self._lock:
+            self._cancel_reasons[job_id] = (reason, time())
+            self._prune(self._cancel_reasons, lambda value: value[1])
+
+    def cancel_reason(self, job_id):
+        with self._lock:
+            entry = self._cancel_reasons.get(job_id)
+        return entry[0] if entry else None
+
+    def watch(self, job_id, sid):
+        """Record that the socket sid is following job_id."""
+        with self._lock:
+            self._watchers.setdefault(job_id, set()).add(sid)
+            self._unwatched_at.pop(job_id, None)
+
+    def unwatch(self, sid):
+        """Forget a disconnected socket, marking jobs it was the last watcher of."""
+        now = time()
+        with self._lock:
+            for job_id, sids in list(self._watchers.items()):
+                if sid in sids:
+                    sids.discard(sid)
+                    if not sids:
+                        del self._watchers[job_id]
+                        self._unwatched_at[job_id] = now
+            self._prune(self._unwatched_at, lambda value: value)
+
+    def unwatched_since(self, job_id):
+        """When the last socket watching job_id went away, or None while one still is."""
+        with self._lock:
+            return self._unwatched_at.get(job_id)
+
+    def forget_job(self, job_id):
+        with self._lock:
+            self._cancel_reasons.pop(job_id, None)
+            self._watchers.pop(job_id, None)
+            self._unwatched_at.pop(job_id, None)
+
+    def _prune(self, entries, recorded_at):
+        cutoff = time() - self.forget_after
+        for key in [key for key, value in entries.items() if recorded_at(value) < cutoff]:
+            del entries[key]
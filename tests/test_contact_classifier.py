@@ -0,0 +1,26 @@
+import pytest
+
+from contact_classifier import ContactClassifier
+
+
+@pytest.mark.parametrize('position, level', [
+    ('HR Business Partner', None),
+    ('Partner Manager', 'Lead'),
+    ('Partner', 'Director'),
+    ('Vice-President Engineering', 'Director'),
+    ('Vice President Sales', 'Director'),
+    ('President', 'C-Level'),
+    ('Managing Partner', 'C-Level'),
+])
+def test_level(position, level):
+    assert ContactClassifier().classify(position, '')['Level'] == level
+
+
+@pytest.mark.parametrize('company, industries', [
+    ('Customer Care GmbH', []),
+    ('Sunrise Care Home', ['Healthcare']),
+    ('Acme Healthcare', ['Healthcare']),
+    ('Health Care Partners', ['Healthcare']),
+])
+def test_industry(company, industries):
+    assert ContactClassifier().classify('', company)['Industry'] == industries
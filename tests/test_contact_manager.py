@@ -0,0 +1,47 @@
+from contact_manager import ContactManager
+
+
+class RecordingNotionManager:
+    def __init__(self):
+        self.writes = []
+
+    def archive_contacts(self, page_ids, progress_callback=None):
+        return self._write('archive', page_ids, progress_callback)
+
+    def tag_removed_contacts(self, page_ids, progress_callback=None):
+        return self._write('tag', page_ids, progress_callback)
+
+    def _write(self, action, page_ids, progress_callback):
+        for index, page_id in enumerate(page_ids, 1):
+            self.writes.append((action, page_id))
+            if progress_callback:
+                progress_callback(index, len(page_ids))
+        return len(page_ids)
+
+
+def make_page(page_id):
+    return {'id': page_id, 'properties': {}}
+
+
+def test_reconciliation_yields_between_slices_of_writes():
+    notion_manager = RecordingNotionManager()
+    manager = ContactManager(notion_manager, linkedin_parser=None)
+    removable = [make_page(f'r{index}') for index in range(5)]
+    protected = [make_page('p0'), make_page('p1')]
+    progress = []
+
+    steps = manager.reconcile_removed_contacts(
+        removable, protected, 'archive', lambda current, total: progress.append((current, total)), slice_size=2)
+    remaining = []
+    writes_at_yield = []
+    try:
+        while True:
+            remaining.append(next(steps))
+            writes_at_yield.append(len(notion_manager.writes))
+    except StopIteration as stop:
+        result = stop.value
+
+    assert result == (5, 2)
+    assert remaining == [5, 3, 2]
+    assert writes_at_yield == [2, 4, 5]
+    assert progress[-1] == (7, 7)
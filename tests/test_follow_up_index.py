@@ -0,0 +1,38 @@
+from datetime import date
+
+from follow_up_index import FollowUpIndex
+
+
+def make_page(page_id, last_contacted='2024-01-01'):
+    return {
+        'id': page_id,
+        'properties': {
+            'Name': {'title': [{'plain_text': page_id}]},
+            'Contact Schedule': {'select': {'name': 'Monthly'}},
+            'Last Contacted': {'date': {'start': last_contacted}},
+        },
+    }
+
+
+def due_ids(index):
+    return [entry['id'] for entry in index.due(as_of=date(2025, 1, 1))]
+
+
+def test_partial_observation_keeps_pages_it_did_not_see():
+    index = FollowUpIndex()
+    index.observe_pages([make_page('a'), make_page('b')], complete=True)
+
+    index.observe_pages([make_page('a')])
+
+    assert sorted(due_ids(index)) == ['a', 'b']
+
+
+def test_complete_observation_drops_pages_missing_from_it():
+    index = FollowUpIndex()
+    index.observe_pages([make_page('a'), make_page('b')], complete=True)
+
+    # b was archived or deleted in Notion, so the next full scan omits it
+    index.observe_pages([make_page('a')], complete=True)
+
+    assert due_ids(index) == ['a']
+    assert len(index) == 1
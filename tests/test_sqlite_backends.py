@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+from sqlite_backends import SqliteJobControl, SqliteJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SqliteJobQueue(str(tmp_path / 'queue.sqlite3'), maxsize=10, aging_rate=0, stale_after=300)
+
+
+def make_job(job_id, database_id='db'):
+    return {'job_id': job_id, 'notion_database_id': database_id}
+
+
+def age_heartbeats(queue, seconds):
+    with sqlite3.connect(queue.path) as connection:
+        connection.execute('UPDATE sync_jobs SET heartbeat_at = heartbeat_at - ?', (seconds,))
+
+
+def test_claim_takes_cheapest_job_once(queue):
+    queue.put(make_job('big', 'X'), cost=1000)
+    queue.put(make_job('small', 'Y'), cost=10)
+
+    assert queue.claim('w1')['job_id'] == 'small'
+    assert queue.claim('w2')['job_id'] == 'big'
+    assert queue.claim('w3') is None
+
+
+def test_claim_skips_database_with_claimed_job(queue):
+    queue.put(make_job('first', 'X'), cost=10)
+    queue.put(make_job('second', 'X'), cost=1)
+    assert queue.claim('w1')['job_id'] == 'second'
+
+    assert queue.claim('w2') is None
+    assert queue.finish('second', 'w1')
+    assert queue.claim('w2')['job_id'] == 'first'
+
+
+def test_stale_claim_is_reclaimed(queue):
+    queue.put(make_job('job'), cost=10)
+    assert queue.claim('w1')['job_id'] == 'job'
+
+    age_heartbeats(queue, 301)
+
+    assert queue.claim('w2')['job_id'] == 'job'
+
+
+def test_heartbeat_renews_every_claim_of_the_worker(queue):
+    queue.put(make_job('a', 'X'), cost=10)
+    queue.put(make_job('b', 'Y'), cost=20)
+    queue.claim('w1')
+    queue.claim('w1')
+
+    age_heartbeats(queue, 301)
+    queue.heartbeat('w1')
+
+    assert queue.claim('w2') is None
+
+
+def test_finish_by_worker_that_lost_its_claim_keeps_the_job(queue):
+    queue.put(make_job('job'), cost=10)
+    queue.claim('w1')
+    age_heartbeats(queue, 301)
+    queue.claim('w2')
+
+    assert not queue.finish('job', 'w1')
+    assert queue.finish('job', 'w2')
+    assert queue.claim('w3') is None
+
+
+def test_reconnected_socket_keeps_the_job_watched(tmp_path):
+    control = SqliteJobControl(str(tmp_path / 'queue.sqlite3'))
+    control.watch('job', 'old-sid')
+    control.unwatch('old-sid')
+    assert control.unwatched_since('job') is not None
+
+    control.watch('job', 'new-sid')
+    assert control.unwatched_since('job') is None
+
+    control.forget_job('job')
+    control.unwatch('new-sid')
+    assert control.unwatched_since('job') is None
@@ -0,0 +1,68 @@
+from operator import itemgetter
+
+from sync_scheduler import JobControl, SyncScheduler
+
+
+def make_job(job_id, database_id):
+    return {'job_id': job_id, 'notion_database_id': database_id}
+
+
+def make_scheduler():
+    return SyncScheduler(maxsize=10, aging_rate=0, lane_key=itemgetter('notion_database_id'))
+
+
+def test_get_returns_shortest_job_first():
+    scheduler = make_scheduler()
+    scheduler.put(make_job('big', 'X'), cost=1000)
+    scheduler.put(make_job('small', 'Y'), cost=10)
+
+    assert scheduler.get()['job_id'] == 'small'
+    assert scheduler.get()['job_id'] == 'big'
+
+
+def test_started_job_blocks_other_jobs_for_the_same_database():
+    scheduler = make_scheduler()
+    big = make_job('big', 'X')
+    scheduler.put(big, cost=1000)
+    assert scheduler.get() is big
+
+    scheduler.put(make_job('small', 'X'), cost=5)
+    scheduler.put(make_job('other', 'Y'), cost=50)
+    scheduler.requeue(big, remaining_cost=900)
+
+    # The small job for X is passed over while big, also for X, is unfinished
+    assert scheduler.get()['job_id'] == 'other'
+    assert scheduler.get() is big
+    scheduler.task_done(big)
+    assert scheduler.get()['job_id'] == 'small'
+
+
+def test_task_done_of_another_job_does_not_free_the_lane():
+    scheduler = make_scheduler()
+    first = make_job('first', 'X')
+    scheduler.put(first, cost=10)
+    assert scheduler.get() is first
+    scheduler.put(make_job('second', 'X'), cost=1)
+    scheduler.put(make_job('other', 'Y'), cost=5)
+
+    other = scheduler.get()
+    scheduler.task_done(other)
+    scheduler.requeue(first, remaining_cost=5)
+
+    assert scheduler.get() is first
+
+
+def test_job_is_unwatched_only_after_its_last_socket_leaves():
+    control = JobControl()
+    control.watch('job', 'old-sid')
+    control.watch('job', 'new-sid')
+
+    control.unwatch('old-sid')
+    assert control.unwatched_since('job') is None
+
+    control.unwatch('new-sid')
+    assert control.unwatched_since('job') is not None
+
+    # A reconnected client watching again clears the mark
+    control.watch('job', 'newer-sid')
+    assert control.unwatched_since('job') is None
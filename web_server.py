@@ -2,32 +2,85 @@
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, render_template, jsonify, request, flash, send_from_directory
+from flask import Flask, Response, render_template, jsonify, request, flash, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from werkzeug.utils import secure_filename
-from notion_manager import NotionManager
-from linkedin_parser import LinkedInParser
+from notion_manager import NotionManager, SyncCancelled
+from linkedin_parser import LinkedInParser, InvalidExportError, SNIFF_BYTES
 from contact_manager import ContactManager
+from follow_up_index import FollowUpIndex
+from notion_export import EXPORT_FORMATS, export_chunks
+from job_profiler import JobProfiler, profile_path, trace_path, prune_artifacts
+from sync_scheduler import SyncScheduler, JobControl
+from sqlite_backends import SqliteJobQueue, SqliteJobControl, SqlitePubSubManager
 import os
+import argparse
+import re
+import uuid
+import hashlib
+import itertools
+from operator import itemgetter
 import logging
 from functools import wraps
 from time import time
-from notion_client.errors import APIResponseError
 import traceback
-import queue
 import threading
 
-app = Flask(__name__, static_folder='static')
-app.config['SECRET_KEY'] = os.urandom(24)
-CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
-
 UPLOAD_FOLDER = 'uploads'
+PROFILE_FOLDER = 'profiles'
+MAX_PROFILE_ARTIFACTS = 50
 ALLOWED_EXTENSIONS = {'csv'}
-SYNC_TIMEOUT = 600  # 10 minutes timeout
+# Running time a sync may use before it is stopped: SYNC_TIMEOUT seconds plus
+# SYNC_TIMEOUT_PER_ROW for every contact it has to write. Only the job's own
+# slices count, not time spent queued or paused while other jobs run.
+SYNC_TIMEOUT = int(os.getenv('SYNC_TIMEOUT', '600'))
+SYNC_TIMEOUT_PER_ROW = float(os.getenv('SYNC_TIMEOUT_PER_ROW', '1'))
 MAX_RETRIES = 3
+# A job is cancelled once no browser has watched it for this long. A client
+# that reconnects, or a reloaded page, watches its job again with watch_job,
+# so a page reload or a brief network drop does not stop the sync.
+CLIENT_GONE_GRACE_SECONDS = 30
 MAX_QUEUE_SIZE = 10
+# Contacts processed per scheduling slice before the worker re-checks the queue
+SYNC_SLICE_SIZE = 100
+# Rows of estimated cost a waiting job is credited per second, so large jobs
+# are not starved by a stream of small ones
+SCHEDULER_AGING_ROWS_PER_SECOND = 20
+MAX_DUE_RESULTS = 500
+# How contacts missing from the export are reconciled: '' leaves them alone,
+# 'preview' only reports the count, 'tag' and 'archive' write to Notion
+RECONCILE_MODES = {'', 'preview', 'tag', 'archive'}
+# 'archive' also needs archive_count, the number of pages an earlier 'preview'
+# run reported it would archive, and refuses to run when that has changed
+# Largest number of filtered Notion queries a sync may issue before it falls
+# back to paging through the whole database instead
+TARGETED_LOOKUP_MAX_REQUESTS = int(os.getenv('TARGETED_LOOKUP_MAX_REQUESTS', '20'))
+# 'memory' keeps the job queue inside this process. 'sqlite' shares it through
+# SYNC_QUEUE_DB so several web and worker processes on one host can split the load.
+SYNC_QUEUE_BACKEND = os.getenv('SYNC_QUEUE_BACKEND', 'memory')
+SYNC_QUEUE_DB = os.getenv('SYNC_QUEUE_DB', 'sync_queue.sqlite3')
+# Socket.IO message queue relaying progress events between processes, either
+# sqlite:///path/to/file or any URL Flask-SocketIO supports (e.g. redis://)
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+# Jobs a worker claims from the shared queue at once, so a small job can run
+# between the slices of a large one
+WORKER_MAX_ACTIVE_JOBS = 2
+WORKER_POLL_INTERVAL = 0.5
+# A claimed job is handed to another worker after this long without a heartbeat
+STALE_CLAIM_SECONDS = 300
+HEARTBEAT_INTERVAL = STALE_CLAIM_SECONDS / 5
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+app = Flask(__name__, static_folder='static')
+app.config['SECRET_KEY'] = os.urandom(24)
+CORS(app)
+if SOCKETIO_MESSAGE_QUEUE and SOCKETIO_MESSAGE_QUEUE.startswith('sqlite:///'):
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet',
+                        client_manager=SqlitePubSubManager(SOCKETIO_MESSAGE_QUEUE[len('sqlite:///'):]))
+else:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet',
+                        message_queue=SOCKETIO_MESSAGE_QUEUE)
 
 # Configure logging with more detailed format and DEBUG level
 logging.basicConfig(
@@ -39,8 +92,27 @@ logging.basicConfig(
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Global variables for sync state management
-sync_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+# run_queue holds the jobs this process's worker is running. With the shared
+# backend, /sync admits jobs to sync_queue and workers claim them into their
+# run_queue; otherwise both are the same scheduler.
+# Jobs for the same database run one after another, so a job never diffs
+# against a snapshot another job is still writing to
+run_queue = SyncScheduler(maxsize=MAX_QUEUE_SIZE, aging_rate=SCHEDULER_AGING_ROWS_PER_SECOND,
+                          lane_key=itemgetter('notion_database_id'))
+if SYNC_QUEUE_BACKEND == 'sqlite':
+    sync_queue = SqliteJobQueue(SYNC_QUEUE_DB, maxsize=MAX_QUEUE_SIZE, aging_rate=SCHEDULER_AGING_ROWS_PER_SECOND,
+                                stale_after=STALE_CLAIM_SECONDS)
+    job_control = SqliteJobControl(SYNC_QUEUE_DB)
+else:
+    sync_queue = run_queue
+    job_control = JobControl()
 sync_lock = threading.Lock()
+# Generators and profilers of jobs that have started, keyed by job ID.
+# Only touched by the worker thread.
+running_jobs = {}
+# Follow-up indexes keyed by (database ID, token digest) so that reading
+# one back requires the same credentials that synced it
+follow_up_indexes = {}
 
 class SyncError:
     FILE_UPLOAD = "FILE_UPLOAD_ERROR"
@@ -51,6 +123,7 @@ class SyncError:
     VALIDATION = "VALIDATION_ERROR"
     RETRY_FAILED = "RETRY_FAILED"
     QUEUE_FULL = "QUEUE_FULL_ERROR"
+    CANCELLED = "CANCELLED"
 
 def error_response(error_type, message, details=None, status_code=400):
     error_data = {
@@ -66,201 +139,469 @@ def error_response(error_type, message, details=None, status_code=400):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def sniff_upload(file):
+    """Sniff an uploaded export's layout from its first bytes, leaving the stream rewound."""
+    head = file.stream.read(SNIFF_BYTES)
+    file.stream.seek(0, os.SEEK_END)
+    total_size = file.stream.tell()
+    file.stream.seek(0)
+    return LinkedInParser().sniff_export(head, total_size)
+
+def form_flag(name):
+    return request.form.get(name, '').lower() in ('1', 'true', 'on', 'yes')
+
 def emit_sync_progress(data, room=None):
     with app.app_context():
         try:
-            socketio.emit('sync_progress', data, room=room)
+            # sent_at lets clients measure event delivery lag
+            socketio.emit('sync_progress', {**data, 'sent_at': time()}, room=room)
         except Exception as e:
             logging.error(f"Error emitting sync progress: {str(e)}")
 
-def process_sync_queue():
-    while True:
-        try:
-            sync_data = sync_queue.get()
-            if sync_data is None:  # Shutdown signal
-                logging.info("Received shutdown signal, stopping sync queue processor")
-                break
+def get_follow_up_index(notion_token, notion_database_id, create=False):
+    token_digest = hashlib.sha256(notion_token.encode('utf-8')).hexdigest()
+    key = (notion_database_id, token_digest)
+    with sync_lock:
+        if key not in follow_up_indexes and create:
+            follow_up_indexes[key] = FollowUpIndex()
+        return follow_up_indexes.get(key)
+
+def reconcile_removed_contacts(contact_manager, existing_by_url, linkedin_contacts, mode, follow_up_index, room,
+                               archive_count=None):
+    """Run the reconciliation phase and return a summary to append to the sync message.
+
+    This is a generator, run with yield from inside run_sync_job: it yields
+    the number of writes left after every SYNC_SLICE_SIZE writes. Archiving only goes ahead when archive_count matches the number of pages
+    it would archive, so a partial export cannot archive pages the user
+    never saw counted.
+    """
+    if not any(contact.get('LinkedIn URL') for contact in linkedin_contacts):
+        logging.warning("Export has no LinkedIn URLs, skipping reconciliation")
+        return ' Reconciliation skipped: the export contains no LinkedIn URLs.'
+
+    removable, protected = contact_manager.find_removed_contacts(existing_by_url, linkedin_contacts)
+    preview_message = (
+        f'{len(removable) + len(protected)} contacts in Notion are missing from the export '
+        f'({len(removable)} would be archived, {len(protected)} protected by user-entered fields)'
+    )
+    emit_sync_progress({
+        'status': 'processing',
+        'message': f'{preview_message}. Mode: {mode}.'
+    }, room)
+    if mode == 'preview':
+        return f' {preview_message}; no changes made.'
+    if mode == 'archive' and archive_count != len(removable):
+        logging.warning(f"Refusing to archive {len(removable)} pages, {archive_count} were confirmed")
+        return (f' Reconciliation refused: {len(removable)} pages would be archived but {archive_count} '
+                f'were confirmed; no changes made. Run "Count them only" again and confirm the new count.')
+
+    def report_progress(current, total):
+        emit_sync_progress({
+            'status': 'processing',
+            'message': f'Reconciling removed contacts ({mode})',
+            'total': total,
+            'current': current
+        }, room)
+
+    archived, tagged = yield from contact_manager.reconcile_removed_contacts(
+        removable, protected, mode, report_progress, SYNC_SLICE_SIZE)
+    if archived and follow_up_index is not None:
+        for page in removable:
+            follow_up_index.remove(page['id'])
+    return f' Reconciliation: {archived} archived, {tagged} tagged as removed from LinkedIn.'
+
+def job_rooms(sync_data):
+    """Rooms a job's progress goes to: the submitting socket and the job's own room.
+
+    Sockets join the job room through watch_job, so a client that reconnects
+    with a new socket ID keeps receiving the job's events.
+    """
+    return [sync_data.get('room'), sync_data['job_id']]
+
+def run_sync_job(sync_data, job_profiler=None):
+    """Run a single sync job and report its progress to the job's rooms.
+
+    This is a generator: it yields the cost of the work left after every
+    SYNC_SLICE_SIZE contacts, pages scanned or reconciliation writes, so the
+    scheduler can run other jobs in between.
+    """
+    # Imported here rather than at module level so the Notion client
+    # is only loaded once a job arrives
+    from notion_client.errors import APIResponseError
+
+    room = job_rooms(sync_data)
+    logging.info(f"Starting sync process {sync_data['job_id']} for session: {sync_data.get('room')}")
+    emit_sync_progress({
+        'status': 'processing',
+        'message': 'Starting sync process...'
+    }, room)
+
+    job_id = sync_data['job_id']
+    filepath = sync_data['filepath']
+    notion_token = sync_data['notion_token']
+    notion_database_id = sync_data['notion_database_id']
+    reconcile_mode = sync_data.get('reconcile', '')
+
+    start_time = time()
+    # Refined once the export is parsed and the Notion pages are loaded
+    time_limit = SYNC_TIMEOUT + SYNC_TIMEOUT_PER_ROW * sync_data.get('estimated_rows', 0)
+    processed_count = 0
+    skipped_count = 0
+    updated_count = 0
+    classified_count = 0
+    added_count = 0
+    error_count = 0
+
+    def check_cancelled():
+        """Raise SyncCancelled if the job ran out of time, was cancelled or no client watches it."""
+        if job_running_time(sync_data) > time_limit:
+            raise SyncCancelled(SyncError.TIMEOUT,
+                                f"Sync stopped after exceeding its {round(time_limit)}s running time limit")
+        reason = job_control.cancel_reason(job_id)
+        if reason:
+            raise SyncCancelled(SyncError.CANCELLED, reason)
+        unwatched_since = job_control.unwatched_since(job_id)
+        if unwatched_since is not None and time() - unwatched_since > CLIENT_GONE_GRACE_SECONDS:
+            raise SyncCancelled(SyncError.CANCELLED,
+                                f"Sync stopped because the browser was disconnected for over {CLIENT_GONE_GRACE_SECONDS}s")
 
-            room = sync_data.get('room')
-            logging.info(f"Starting sync process for session: {room}")
+    try:
+        check_cancelled()
+        os.environ['NOTION_TOKEN'] = notion_token
+        os.environ['NOTION_DATABASE_ID'] = notion_database_id
+
+        # Initialize managers and create ContactManager instance
+        logging.info("Initializing NotionManager and LinkedInParser")
+        notion_manager = NotionManager(api_tracer=job_profiler, check_cancelled=check_cancelled)
+        linkedin_parser = LinkedInParser()
+        contact_manager = ContactManager(notion_manager, linkedin_parser)
+
+        # Step 1: Parse LinkedIn contacts
+        logging.info(f"Starting LinkedIn file parsing: {filepath}")
+        logging.debug(f"Reading CSV file from path: {filepath}")
+        emit_sync_progress({
+            'status': 'processing',
+            'message': 'Loading LinkedIn contacts from CSV file...'
+        }, room)
+        linkedin_contacts = linkedin_parser.parse_linkedin_export(filepath, sync_data.get('layout'))
+        logging.info(f"Successfully parsed {len(linkedin_contacts)} contacts from LinkedIn CSV")
+        logging.debug("CSV parsing completed successfully")
+        contact_manager.classify_contacts(linkedin_contacts)
+
+        # Step 2: Load Notion contacts
+        logging.info("Starting Notion database connection")
+        emit_sync_progress({
+            'status': 'processing',
+            'message': 'Loading existing contacts from Notion database...'
+        }, room)
+        # Finding removed connections needs every page in the database
+        full_scan = bool(reconcile_mode) or contact_manager.prefers_full_scan(
+            linkedin_contacts, TARGETED_LOOKUP_MAX_REQUESTS)
+        if full_scan:
+            existing_contacts = []
+            for batch in notion_manager.iter_contact_pages():
+                existing_contacts.extend(batch)
+                # Each response holds up to SYNC_SLICE_SIZE pages; the export's
+                # rows are all still to be processed
+                yield sync_data.get('estimated_rows', len(linkedin_contacts))
+            logging.info(f"Retrieved {len(existing_contacts)} contacts from the database")
+        else:
+            existing_contacts = contact_manager.get_existing_contacts(linkedin_contacts)
+        existing_by_url = contact_manager.index_by_linkedin_url(existing_contacts)
+        logging.info(f"Retrieved {len(existing_contacts)} existing contacts from Notion database")
+        # A full scan lists every live page, so pages missing from it were
+        # deleted or archived in Notion and leave the index
+        get_follow_up_index(notion_token, notion_database_id, create=True).observe_pages(
+            existing_contacts, complete=full_scan)
+        logging.debug("Notion database connection and retrieval successful")
+        # Reconciliation may write to any page missing from the export
+        time_limit = SYNC_TIMEOUT + SYNC_TIMEOUT_PER_ROW * (
+            len(linkedin_contacts) + (len(existing_contacts) if reconcile_mode else 0))
+
+        total_contacts = len(linkedin_contacts)
+        valid_contacts = sum(1 for c in linkedin_contacts if contact_manager._is_valid_contact(c))
+        invalid_contacts = total_contacts - valid_contacts
+        logging.info(f"Found {valid_contacts} valid contacts out of {total_contacts} total contacts")
+        logging.debug(f"Skipping {invalid_contacts} invalid contacts")
+
+        emit_sync_progress({
+            'status': 'processing',
+            'message': f'Processing {valid_contacts} valid LinkedIn contacts...',
+            'total': valid_contacts,
+            'current': 0
+        }, room)
+
+        # Step 3: Sync contacts
+        for index, contact in enumerate(linkedin_contacts, 1):
+            contact_name = contact.get('Name', 'Unknown Contact')
+            linkedin_url = contact.get('LinkedIn URL', 'No URL')
+            company = contact.get('Company', 'No Company')
+            position = contact.get('Position', 'No Position')
+            
+            logging.debug(f"Processing contact {index}/{total_contacts}:")
+            logging.debug(f"  Name: {contact_name}")
+            
+            if not contact_manager._is_valid_contact(contact):
+                skipped_count += 1
+                logging.info(f"Skipping invalid contact: {contact_name}")
+                logging.debug(f"  Reason: Missing required fields")
+                continue
+
+            if processed_count and processed_count % SYNC_SLICE_SIZE == 0:
+                yield valid_contacts - processed_count
+            check_cancelled()
+
+            processed_count += 1
+            logging.info(f"Processing contact {processed_count}/{valid_contacts}: {contact_name}")
+            
             emit_sync_progress({
                 'status': 'processing',
-                'message': 'Starting sync process...'
+                'message': f'Processing contact {processed_count} of {valid_contacts}',
+                'contact': contact_name,
+                'total': valid_contacts,
+                'current': processed_count
             }, room)
 
-            filepath = sync_data['filepath']
-            notion_token = sync_data['notion_token']
-            notion_database_id = sync_data['notion_database_id']
-
+            # Process the contact using ContactManager
             try:
-                start_time = time()
-                os.environ['NOTION_TOKEN'] = notion_token
-                os.environ['NOTION_DATABASE_ID'] = notion_database_id
-
-                # Initialize managers and create ContactManager instance
-                logging.info("Initializing NotionManager and LinkedInParser")
-                notion_manager = NotionManager()
-                linkedin_parser = LinkedInParser()
-                contact_manager = ContactManager(notion_manager, linkedin_parser)
-
-                # Step 1: Parse LinkedIn contacts
-                logging.info(f"Starting LinkedIn file parsing: {filepath}")
-                logging.debug(f"Reading CSV file from path: {filepath}")
-                emit_sync_progress({
-                    'status': 'processing',
-                    'message': 'Loading LinkedIn contacts from CSV file...'
-                }, room)
-                linkedin_contacts = linkedin_parser.parse_linkedin_export(filepath)
-                logging.info(f"Successfully parsed {len(linkedin_contacts)} contacts from LinkedIn CSV")
-                logging.debug("CSV parsing completed successfully")
-
-                # Step 2: Load Notion contacts
-                logging.info("Starting Notion database connection")
-                emit_sync_progress({
-                    'status': 'processing',
-                    'message': 'Loading existing contacts from Notion database...'
-                }, room)
-                existing_contacts = contact_manager.get_all_contacts()
-                logging.info(f"Retrieved {len(existing_contacts)} existing contacts from Notion database")
-                logging.debug("Notion database connection and retrieval successful")
-
-                total_contacts = len(linkedin_contacts)
-                valid_contacts = sum(1 for c in linkedin_contacts if contact_manager._is_valid_contact(c))
-                invalid_contacts = total_contacts - valid_contacts
-                logging.info(f"Found {valid_contacts} valid contacts out of {total_contacts} total contacts")
-                logging.debug(f"Skipping {invalid_contacts} invalid contacts")
-
-                emit_sync_progress({
-                    'status': 'processing',
-                    'message': f'Processing {valid_contacts} valid LinkedIn contacts...',
-                    'total': valid_contacts,
-                    'current': 0
-                }, room)
-
-                # Step 3: Sync contacts
-                processed_count = 0
-                skipped_count = 0
-                updated_count = 0
-                added_count = 0
-                error_count = 0
-                for index, contact in enumerate(linkedin_contacts, 1):
-                    contact_name = contact.get('Name', 'Unknown Contact')
-                    linkedin_url = contact.get('LinkedIn URL', 'No URL')
-                    company = contact.get('Company', 'No Company')
-                    position = contact.get('Position', 'No Position')
-                    
-                    logging.debug(f"Processing contact {index}/{total_contacts}:")
-                    logging.debug(f"  Name: {contact_name}")
-                    
-                    if not contact_manager._is_valid_contact(contact):
-                        skipped_count += 1
-                        logging.info(f"Skipping invalid contact: {contact_name}")
-                        logging.debug(f"  Reason: Missing required fields")
-                        continue
-
-                    processed_count += 1
-                    logging.info(f"Processing contact {processed_count}/{valid_contacts}: {contact_name}")
-                    
-                    emit_sync_progress({
-                        'status': 'processing',
-                        'message': f'Processing contact {processed_count} of {valid_contacts}',
-                        'contact': contact_name,
-                        'total': valid_contacts,
-                        'current': processed_count
-                    }, room)
-
-                    # Process the contact using ContactManager
-                    try:
-                        existing_contact = next(
-                            (existing for existing in existing_contacts 
-                             if existing['properties'].get('LinkedIn URL', {}).get('url') == linkedin_url),
-                            None
-                        )
-                        
-                        if existing_contact:
-                            logging.debug(f"Found existing contact in Notion database")
-                            # Check if contact actually needed updates
-                            if contact_manager._has_changes(existing_contact, contact):
-                                logging.info(f"Changes detected for contact: {contact_name}")
-                                contact_manager._process_single_contact(contact, existing_contacts)
-                                updated_count += 1
-                                logging.info(f"Successfully updated contact: {contact_name}")
-                                logging.debug(f"  Updated fields for {contact_name}")
-                            else:
-                                skipped_count += 1
-                                logging.info(f"No changes detected, skipping contact: {contact_name}")
-                        else:
-                            logging.info(f"Adding new contact to database: {contact_name}")
-                            contact_manager._process_single_contact(contact, existing_contacts)
-                            added_count += 1
-                            logging.info(f"Successfully added new contact: {contact_name}")
-                            logging.debug(f"  Added new contact with fields:")
-                            logging.debug(f"    Name: {contact_name}")
-                    except Exception as e:
-                        error_count += 1
-                        logging.error(f"Error processing contact {contact_name}: {str(e)}")
-                        logging.debug(f"  Error details for {contact_name}:")
-                        logging.debug(f"    Error type: {type(e).__name__}")
-                        logging.debug(f"    Error message: {str(e)}")
-                        logging.debug(f"    Stack trace:\n{traceback.format_exc()}")
-                        raise
-
-                end_time = time()
-                duration = round(end_time - start_time, 2)
-                success_message = (
-                    f"Sync completed successfully in {duration}s! "
-                    f"Processed {processed_count} contacts "
-                    f"({added_count} added, {updated_count} updated, {skipped_count} skipped, {error_count} errors)"
-                )
-                logging.info(success_message)
-                logging.debug("Final sync statistics:")
-                logging.debug(f"  Total contacts: {total_contacts}")
-                logging.debug(f"  Valid contacts: {valid_contacts}")
-                logging.debug(f"  Invalid contacts: {invalid_contacts}")
-                logging.debug(f"  Added: {added_count}")
-                logging.debug(f"  Updated: {updated_count}")
-                logging.debug(f"  Skipped: {skipped_count}")
-                logging.debug(f"  Errors: {error_count}")
-                logging.debug(f"  Duration: {duration}s")
+                existing_contact = existing_by_url.get(linkedin_url)
                 
-                emit_sync_progress({
-                    'status': 'completed',
-                    'message': success_message
-                }, room)
-
-            except APIResponseError as e:
-                logging.error(f"Notion API Error: {str(e)}\n{traceback.format_exc()}")
-                emit_sync_progress({
-                    'status': 'error',
-                    'error_type': SyncError.NOTION_API,
-                    'message': str(e),
-                    'details': traceback.format_exc()
-                }, room)
+                if existing_contact:
+                    logging.debug(f"Found existing contact in Notion database")
+                    # Check if contact actually needed updates
+                    if contact_manager._has_changes(existing_contact, contact):
+                        logging.info(f"Changes detected for contact: {contact_name}")
+                        contact_manager._process_single_contact(contact, existing_by_url)
+                        updated_count += 1
+                        logging.info(f"Successfully updated contact: {contact_name}")
+                        logging.debug(f"  Updated fields for {contact_name}")
+                    elif contact_manager._missing_classifications(existing_contact, contact):
+                        # Back-filling classifications is not a LinkedIn change,
+                        # so it is counted apart and leaves Updated alone
+                        contact_manager._process_single_contact(contact, existing_by_url)
+                        classified_count += 1
+                        logging.info(f"Added classifications to contact: {contact_name}")
+                    else:
+                        skipped_count += 1
+                        logging.info(f"No changes detected, skipping contact: {contact_name}")
+                else:
+                    logging.info(f"Adding new contact to database: {contact_name}")
+                    contact_manager._process_single_contact(contact, existing_by_url)
+                    added_count += 1
+                    logging.info(f"Successfully added new contact: {contact_name}")
+                    logging.debug(f"  Added new contact with fields:")
+                    logging.debug(f"    Name: {contact_name}")
             except Exception as e:
-                error_type = SyncError.NETWORK if "connection" in str(e).lower() else SyncError.FILE_PROCESSING
-                logging.error(f"{error_type} Error: {str(e)}\n{traceback.format_exc()}")
-                emit_sync_progress({
-                    'status': 'error',
-                    'error_type': error_type,
-                    'message': str(e),
-                    'details': traceback.format_exc()
-                }, room)
+                error_count += 1
+                logging.error(f"Error processing contact {contact_name}: {str(e)}")
+                logging.debug(f"  Error details for {contact_name}:")
+                logging.debug(f"    Error type: {type(e).__name__}")
+                logging.debug(f"    Error message: {str(e)}")
+                logging.debug(f"    Stack trace:\n{traceback.format_exc()}")
+                raise
+
+        # Step 4: Reconcile contacts that are no longer in the export
+        reconcile_message = ''
+        if reconcile_mode:
+            reconcile_message = yield from reconcile_removed_contacts(
+                contact_manager, existing_by_url, linkedin_contacts, reconcile_mode,
+                get_follow_up_index(notion_token, notion_database_id), room, sync_data.get('archive_count'))
+
+        end_time = time()
+        duration = round(end_time - start_time, 2)
+        success_message = (
+            f"Sync completed successfully in {duration}s! "
+            f"Processed {processed_count} contacts "
+            f"({added_count} added, {updated_count} updated, {classified_count} classified, "
+            f"{skipped_count} skipped, {error_count} errors)"
+            f"{reconcile_message}"
+        )
+        logging.info(success_message)
+        logging.debug("Final sync statistics:")
+        logging.debug(f"  Total contacts: {total_contacts}")
+        logging.debug(f"  Valid contacts: {valid_contacts}")
+        logging.debug(f"  Invalid contacts: {invalid_contacts}")
+        logging.debug(f"  Added: {added_count}")
+        logging.debug(f"  Updated: {updated_count}")
+        logging.debug(f"  Classified: {classified_count}")
+        logging.debug(f"  Skipped: {skipped_count}")
+        logging.debug(f"  Errors: {error_count}")
+        logging.debug(f"  Duration: {duration}s")
+        
+        emit_sync_progress({
+            'status': 'completed',
+            'message': success_message
+        }, room)
+
+    except SyncCancelled as e:
+        partial_message = (
+            f"{str(e)}. Processed {processed_count} contacts before stopping "
+            f"({added_count} added, {updated_count} updated, {classified_count} classified, "
+            f"{skipped_count} skipped, {error_count} errors)"
+        )
+        logging.warning(f"Job {job_id}: {partial_message}")
+        emit_sync_progress({
+            'status': 'cancelled',
+            'error_type': e.error_type,
+            'message': partial_message,
+            'partial': {
+                'processed': processed_count,
+                'added': added_count,
+                'updated': updated_count,
+                'classified': classified_count,
+                'skipped': skipped_count,
+                'errors': error_count
+            }
+        }, room)
+    except APIResponseError as e:
+        logging.error(f"Notion API Error: {str(e)}\n{traceback.format_exc()}")
+        emit_sync_progress({
+            'status': 'error',
+            'error_type': SyncError.NOTION_API,
+            'message': str(e),
+            'details': traceback.format_exc()
+        }, room)
+    except Exception as e:
+        error_type = SyncError.NETWORK if "connection" in str(e).lower() else SyncError.FILE_PROCESSING
+        logging.error(f"{error_type} Error: {str(e)}\n{traceback.format_exc()}")
+        emit_sync_progress({
+            'status': 'error',
+            'error_type': error_type,
+            'message': str(e),
+            'details': traceback.format_exc()
+        }, room)
+    finally:
+        job_control.forget_job(job_id)
+
+def remove_upload(filepath):
+    """Clean up a finished job's uploaded file."""
+    if os.path.exists(filepath):
+        try:
+            os.remove(filepath)
+            logging.info(f"Cleaned up temporary file: {filepath}")
+        except Exception as e:
+            logging.warning(f"Error cleaning up file {filepath}: {str(e)}")
+
+def save_job_profile(sync_data, job_profiler):
+    """Write a finished job's profiling artifacts and tell the client where to download them."""
+    try:
+        artifacts = job_profiler.save()
+        prune_artifacts(PROFILE_FOLDER, MAX_PROFILE_ARTIFACTS)
+        job_id = sync_data['job_id']
+        urls = {'profile': f'/profile/{job_id}', 'notion_trace': f'/profile/{job_id}/notion-trace'}
+        emit_sync_progress({
+            'status': 'profile_ready',
+            'job_id': job_id,
+            **{f'{artifact}_url': urls[artifact] for artifact in artifacts}
+        }, job_rooms(sync_data))
+    except Exception as e:
+        logging.error(f"Error saving profile for job {sync_data.get('job_id')}: {str(e)}")
+
+def job_running_time(sync_data):
+    """Seconds a job has spent running in its slices, not queued or paused."""
+    return sync_data.get('_run_seconds', 0.0) + time() - sync_data.get('_slice_started', time())
+
+def run_sync_slice(sync_data):
+    """Run the next slice of a job. Returns True once the job has finished."""
+    job_id = sync_data['job_id']
+    if job_id not in running_jobs:
+        job_profiler = JobProfiler.for_job(sync_data, PROFILE_FOLDER)
+        running_jobs[job_id] = (run_sync_job(sync_data, job_profiler), job_profiler)
+    runner, job_profiler = running_jobs[job_id]
+
+    sync_data['_slice_started'] = time()
+    try:
+        if job_profiler is None:
+            remaining = next(runner)
+        else:
+            remaining = job_profiler.runcall(next, runner)
+    except StopIteration:
+        remaining = None
+    except Exception:
+        running_jobs.pop(job_id, None)
+        raise
+    finally:
+        sync_data['_run_seconds'] = job_running_time(sync_data)
+        del sync_data['_slice_started']
+
+    if remaining is None:
+        running_jobs.pop(job_id, None)
+        if job_profiler is not None:
+            save_job_profile(sync_data, job_profiler)
+        return True
+    logging.info(f"Yielding job {job_id} with remaining cost {remaining}")
+    run_queue.requeue(sync_data, remaining)
+    return False
+
+def claim_shared_jobs():
+    """Move jobs from the shared queue into this worker's run queue."""
+    while run_queue.unfinished_count() < WORKER_MAX_ACTIVE_JOBS:
+        sync_data = sync_queue.claim(WORKER_ID)
+        if sync_data is None:
+            break
+        run_queue.put(sync_data, cost=sync_data['estimated_rows'], admitted_at=sync_data['_admitted_at'])
+
+def finish_job(sync_data):
+    """Release a finished job's slot and claim, and remove its upload if the claim was still ours."""
+    run_queue.task_done(sync_data)
+    if sync_queue is not run_queue and not sync_queue.finish(sync_data['job_id'], WORKER_ID):
+        # Another worker reclaimed the job and may still be reading the file
+        logging.warning(f"Job {sync_data['job_id']} was reclaimed by another worker, keeping its upload")
+        return
+    remove_upload(sync_data['filepath'])
+
+def send_heartbeats():
+    """Renew this worker's claims on a timer, so they survive phases of a job that never yield."""
+    while True:
+        eventlet.sleep(HEARTBEAT_INTERVAL)
+        try:
+            sync_queue.heartbeat(WORKER_ID)
+        except Exception as e:
+            logging.error(f"Heartbeat error: {str(e)}")
+
+def process_sync_queue():
+    while True:
+        try:
+            if sync_queue is not run_queue:
+                # Renew the claims of every job waiting in run_queue, not
+                # just the one that ran last
+                if run_queue.unfinished_count():
+                    sync_queue.heartbeat(WORKER_ID)
+                claim_shared_jobs()
+                if not run_queue.qsize():
+                    eventlet.sleep(WORKER_POLL_INTERVAL)
+                    continue
+
+            sync_data = run_queue.get()
+            if sync_data is None:  # Shutdown signal
+                logging.info("Received shutdown signal, stopping sync queue processor")
+                break
+
+            finished = True
+            try:
+                finished = run_sync_slice(sync_data)
             finally:
-                # Clean up the uploaded file
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                        logging.info(f"Cleaned up temporary file: {filepath}")
-                    except Exception as e:
-                        logging.warning(f"Error cleaning up file {filepath}: {str(e)}")
-                sync_queue.task_done()
+                if finished:
+                    finish_job(sync_data)
 
         except Exception as e:
             logging.error(f"Queue processing error: {str(e)}\n{traceback.format_exc()}")
 
-# Start the queue processing thread
-sync_thread = threading.Thread(target=process_sync_queue, daemon=True)
-sync_thread.start()
+sync_thread = None
+heartbeat_thread = None
+
+def start_sync_worker():
+    """Start the queue processing thread if it is not already running."""
+    global sync_thread, heartbeat_thread
+    with sync_lock:
+        if sync_thread is None or not sync_thread.is_alive():
+            sync_thread = threading.Thread(target=process_sync_queue, daemon=True)
+            sync_thread.start()
+            logging.info("Started sync queue processor")
+        if sync_queue is not run_queue and (heartbeat_thread is None or not heartbeat_thread.is_alive()):
+            heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+            heartbeat_thread.start()
+    return sync_thread
 
 @socketio.on('connect')
 def handle_connect():
@@ -269,6 +610,18 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     logging.info(f"Client disconnected: {request.sid}")
+    # Jobs nobody else watches are cancelled once the grace period passes
+    job_control.unwatch(request.sid)
+
+@socketio.on('watch_job')
+def handle_watch_job(data):
+    """Follow a job's progress from this socket, e.g. after a reconnect or a page reload."""
+    job_id = (data or {}).get('job_id', '')
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return
+    join_room(job_id)
+    job_control.watch(job_id, request.sid)
+    logging.info(f"Client {request.sid} is watching job {job_id}")
 
 @app.route('/')
 def home():
@@ -330,12 +683,6 @@ def sync_contacts():
                 details='Please upload a CSV file exported from LinkedIn'
             )
 
-        # Save the uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        logging.info(f"File saved successfully: {filepath}")
-
         # Validate Notion credentials
         notion_token = request.form.get('notion_token')
         notion_database_id = request.form.get('notion_database_id')
@@ -348,18 +695,69 @@ def sync_contacts():
                 details='Both Notion token and database ID are required'
             )
 
-        # Add to processing queue with socket room ID
+        reconcile_mode = request.form.get('reconcile', '')
+        if reconcile_mode not in RECONCILE_MODES:
+            logging.error(f"Invalid reconcile mode: {reconcile_mode}")
+            return error_response(
+                error_type=SyncError.VALIDATION,
+                message='Invalid reconcile mode',
+                details=f"Reconcile mode must be one of: {', '.join(sorted(m for m in RECONCILE_MODES if m))}"
+            )
+        archive_count = None
+        if reconcile_mode == 'archive':
+            archive_count = request.form.get('archive_count', '')
+            if not archive_count.isdigit():
+                return error_response(
+                    error_type=SyncError.VALIDATION,
+                    message='Missing archive count',
+                    details='Run "Count them only" first and enter the number of pages it would archive'
+                )
+            archive_count = int(archive_count)
+
+        # Check the header from the first few KB of the upload, so files
+        # the worker could not parse are rejected before taking a queue slot
+        try:
+            layout = sniff_upload(file)
+        except InvalidExportError as e:
+            logging.error(f"Rejected upload {file.filename}: {str(e)}")
+            return error_response(
+                error_type=SyncError.VALIDATION,
+                message='Invalid LinkedIn export',
+                details=str(e)
+            )
+
+        # Save the uploaded file under a per-job name so concurrent uploads
+        # of the same file name do not overwrite each other
+        job_id = uuid.uuid4().hex
+        filename = f"{job_id}_{secure_filename(file.filename)}"
+        # Absolute, so worker processes sharing the upload folder can find it
+        filepath = os.path.abspath(os.path.join(UPLOAD_FOLDER, filename))
+        file.save(filepath)
+        logging.info(f"File saved successfully: {filepath}")
+
+        # Add to processing queue with socket room ID, using the sniffed
+        # row estimate as the job's cost for the scheduler
+        estimated_rows = layout['estimated_rows']
+        job_control.watch(job_id, socket_id)
         sync_queue.put({
+            'job_id': job_id,
             'filepath': filepath,
             'notion_token': notion_token,
             'notion_database_id': notion_database_id,
+            'reconcile': reconcile_mode,
+            'archive_count': archive_count,
+            'profile': form_flag('profile'),
+            'trace_notion': form_flag('trace_notion'),
+            'estimated_rows': estimated_rows,
+            'layout': layout,
             'room': socket_id
-        })
-        logging.info(f"Added sync task to queue for session: {socket_id}")
+        }, cost=estimated_rows)
+        logging.info(f"Added sync task {job_id} ({estimated_rows} rows) to queue for session: {socket_id}")
 
         return jsonify({
             'status': 'success',
-            'message': 'Sync process started'
+            'message': 'Sync process started',
+            'job_id': job_id
         })
 
     except Exception as e:
@@ -370,5 +768,136 @@ def sync_contacts():
             details=str(e)
         )
 
+def send_profiling_artifact(job_id, path):
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id) or not os.path.exists(path):
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='Profile not found',
+            details='Profiles are only kept for jobs submitted with profile or trace_notion enabled',
+            status_code=404
+        )
+    return send_from_directory(os.path.abspath(PROFILE_FOLDER), os.path.basename(path), as_attachment=True)
+
+@app.route('/profile/<job_id>')
+def download_profile(job_id):
+    return send_profiling_artifact(job_id, profile_path(PROFILE_FOLDER, job_id))
+
+@app.route('/profile/<job_id>/notion-trace')
+def download_notion_trace(job_id):
+    return send_profiling_artifact(job_id, trace_path(PROFILE_FOLDER, job_id))
+
+@app.route('/cancel/<job_id>', methods=['POST'])
+def cancel_sync(job_id):
+    """Ask a queued or running job to stop; it reports what it had done so far."""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='Invalid job ID',
+            details='Use the job_id returned by /sync'
+        )
+    job_control.request_cancel(job_id, 'Sync cancelled by user')
+    logging.info(f"Cancellation requested for job {job_id}")
+    return jsonify({
+        'status': 'success',
+        'message': 'Cancellation requested',
+        'job_id': job_id
+    })
+
+@app.route('/due', methods=['POST'])
+def due_contacts():
+    """Return overdue contacts from the locally synced snapshot."""
+    notion_token = request.form.get('notion_token')
+    notion_database_id = request.form.get('notion_database_id')
+    if not notion_token or not notion_database_id:
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='Missing Notion credentials',
+            details='Both Notion token and database ID are required'
+        )
+
+    try:
+        limit = min(int(request.form.get('limit', 20)), MAX_DUE_RESULTS)
+        within_days = int(request.form.get('within_days', 0))
+    except ValueError:
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='Invalid query parameters',
+            details='limit and within_days must be integers'
+        )
+
+    follow_up_index = get_follow_up_index(notion_token, notion_database_id)
+    if follow_up_index is None:
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='No synced snapshot for this database',
+            details='Run a sync for this database before querying due contacts',
+            status_code=404
+        )
+
+    return jsonify({
+        'status': 'success',
+        'indexed': len(follow_up_index),
+        'contacts': follow_up_index.due(limit=limit, within_days=within_days)
+    })
+
+@app.route('/export', methods=['POST'])
+def export_contacts():
+    """Stream every page of the Notion database as CSV or JSONL."""
+    notion_token = request.form.get('notion_token')
+    notion_database_id = request.form.get('notion_database_id')
+    export_format = request.form.get('format', 'csv')
+    if not notion_token or not notion_database_id:
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='Missing Notion credentials',
+            details='Both Notion token and database ID are required'
+        )
+    if export_format not in EXPORT_FORMATS:
+        return error_response(
+            error_type=SyncError.VALIDATION,
+            message='Invalid export format',
+            details=f"Format must be one of: {', '.join(sorted(EXPORT_FORMATS))}"
+        )
+
+    notion_manager = NotionManager(token=notion_token, database_id=notion_database_id, check_schema=False)
+    page_batches = notion_manager.iter_contact_pages()
+    try:
+        # Read the first response before answering, so bad credentials
+        # still get an error status instead of an empty download
+        first_batch = next(page_batches, [])
+    except Exception as e:
+        logging.error(f"Export error: {str(e)}\n{traceback.format_exc()}")
+        return error_response(
+            error_type=SyncError.NOTION_API,
+            message='Failed to read the Notion database',
+            details=str(e)
+        )
+
+    def generate():
+        try:
+            yield from export_chunks(itertools.chain([first_batch], page_batches), export_format)
+        except Exception as e:
+            # Headers are already sent, so the client only sees a truncated file
+            logging.error(f"Export of database {notion_database_id} stopped early: {str(e)}")
+
+    logging.info(f"Streaming {export_format} export of database {notion_database_id}")
+    return Response(generate(), mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename=notion-crm-export.{export_format}'
+    })
+
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=3000, debug=False)
+    parser = argparse.ArgumentParser(description='Personal CRM web server and sync worker')
+    role = parser.add_mutually_exclusive_group()
+    role.add_argument('--worker', action='store_true', help='only run the sync worker, without the web server')
+    role.add_argument('--no-worker', action='store_true', help='only run the web server, without a sync worker')
+    args = parser.parse_args()
+    if (args.worker or args.no_worker) and SYNC_QUEUE_BACKEND != 'sqlite':
+        parser.error('--worker and --no-worker need SYNC_QUEUE_BACKEND=sqlite')
+
+    if not args.no_worker:
+        start_sync_worker()
+    if args.worker:
+        logging.info(f"Running sync worker {WORKER_ID} without web server")
+        sync_thread.join()
+    else:
+        socketio.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '3000')), debug=False)